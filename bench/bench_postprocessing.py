@@ -0,0 +1,305 @@
+"""
+[Benchmark] 후처리(매칭/줄 묶기/영역 계산) 및 결과 이미지 저장 경로의 오프라인 마이크로벤치마크입니다.
+- Vision 인증 정보 없이 합성 OCR 단어(한글 + 삽입된 공백/특수문자, 세로로 긴 페이지)와
+  합성 마스터 키워드(100 ~ 100,000개)를 생성하여 측정합니다. (난수 시드 고정 -> 재현 가능)
+- 측정 대상: PostProcessor._prepare_patterns / _find_all_matches / _group_into_lines / _get_match_bbox,
+  ImageHandler.merge_and_save / _save_optimized
+
+사용법 (저장소 루트에서):
+    python bench/bench_postprocessing.py                   # 측정 후 기준값(bench/baseline.json)과 비교
+    python bench/bench_postprocessing.py --save-baseline   # 현재 결과를 기준값으로 저장
+    python bench/bench_postprocessing.py --quick           # 작은 입력으로 빠르게 확인 (기준값: bench/baseline_quick.json, --quick --save-baseline 으로 생성)
+기준값 대비 최소 시간이 --threshold 배(기본 1.3) 이상 느려진 항목이 있으면 종료 코드 1 을 반환합니다.
+- 측정 모드(--quick 여부)가 기준값과 다르면 비교하지 않고 종료 코드 2 를 반환합니다.
+- 실행 환경(Python/CPU)이 기준값과 다르면 경고와 함께 비율만 출력하고 회귀로 판정하지 않습니다.
+"""
+import io
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import platform
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from PIL import Image, ImageDraw
+
+from postprocessing import PostProcessor
+from image_handler import ImageHandler
+from metrics import RunMetrics
+from word_table import WordTable
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+QUICK_BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline_quick.json")
+
+# 한글 음절 범위 (가 ~ 힣) 중 자주 쓰이는 앞부분만 사용
+_HANGUL = [chr(c) for c in range(0xAC00, 0xAC00 + 2000)]
+_NOISE = [" ", ".", "·", "-", "!", ",", " ", "~"]
+
+
+def _logger():
+    logger = logging.getLogger("bench")
+    if not logger.handlers:
+        logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+    return logger
+
+
+# ---------------------------------------------------------
+# 합성 데이터 생성
+# ---------------------------------------------------------
+def make_keywords(rng, count):
+    """카테고리별 마스터 키워드 Set (ban 60%, ftc 30%, except 10%)"""
+    words = set()
+    while len(words) < count:
+        words.add("".join(rng.choice(_HANGUL) for _ in range(rng.randint(2, 6))))
+    words = sorted(words)
+    rng.shuffle(words)
+    n_ban, n_ftc = int(count * 0.6), int(count * 0.3)
+    return {'ban': set(words[:n_ban]), 'ftc': set(words[n_ban:n_ban + n_ftc]), 'except': set(words[n_ban + n_ftc:])}
+
+
+def _noisy(rng, keyword):
+    """키워드 글자 사이에 공백/특수문자를 끼워 넣습니다. (OCR 노이즈 흉내)"""
+    out = []
+    for ch in keyword:
+        out.append(ch)
+        if rng.random() < 0.25:
+            out.append(rng.choice(_NOISE))
+    return "".join(out).strip()
+
+
+def make_page(rng, keyword_sets, n_words, words_per_line=12, hit_ratio=0.05, page_width=860):
+    """
+    세로로 긴 상세페이지 한 장 분량의 단어 목록과 좌표 [x0, y0, x1, y1] 을 만듭니다.
+    일부 단어는 마스터 키워드(노이즈 포함)로 채워 실제 적발이 일어나도록 합니다.
+    """
+    pool = [k for cat in ('ban', 'ftc', 'except') for k in sorted(keyword_sets[cat])]
+    descriptions, boxes = [], []
+    y = 10
+    for i in range(n_words):
+        col = i % words_per_line
+        if col == 0 and i:
+            y += 38
+        if pool and rng.random() < hit_ratio:
+            word = _noisy(rng, rng.choice(pool))
+        else:
+            word = "".join(rng.choice(_HANGUL) for _ in range(rng.randint(1, 5)))
+        x = 10 + col * (page_width // words_per_line)
+        jitter = rng.randint(-4, 4)
+        descriptions.append(word)
+        boxes.append([x, y + jitter, x + 14 * len(word), y + jitter + 26])
+    return descriptions, boxes
+
+
+def make_images(rng, folder, count, width, height):
+    """병합 대상 합성 이미지 (텍스트 줄 모양 사각형으로 채운 PNG)"""
+    paths = []
+    for i in range(count):
+        img = Image.new("RGB", (width, height), "white")
+        draw = ImageDraw.Draw(img)
+        for y in range(10, height - 30, 38):
+            x = 10
+            while x < width - 60:
+                w = rng.randint(20, 90)
+                shade = rng.randint(0, 120)
+                draw.rectangle([x, y, x + w, y + 24], fill=(shade, shade, shade))
+                x += w + rng.randint(8, 20)
+        path = os.path.join(folder, f"page_{i}.png")
+        img.save(path)
+        paths.append(path)
+    return paths
+
+
+def add_texture(rng, page, cell=8, alpha=0.35):
+    """
+    사진처럼 부드러운 색 변화를 섞은 페이지 (단색 사각형만 있는 페이지는 PNG 가 지나치게 잘 압축되어
+    축소해도 용량이 줄지 않으므로, PNG 용량 제한 탐색 측정에는 실제 상세페이지와 비슷한 이 이미지를 사용)
+    """
+    size = (max(1, page.width // cell), max(1, page.height // cell))
+    noise = Image.frombytes("RGB", size, bytes(rng.randrange(256) for _ in range(size[0] * size[1] * 3)))
+    return Image.blend(page, noise.resize(page.size, Image.BICUBIC), alpha)
+
+
+# ---------------------------------------------------------
+# 측정
+# ---------------------------------------------------------
+def measure(fn, repeat, min_sample=0.05):
+    """
+    fn 을 repeat 회 측정하여 1회당 (최소, 중앙값) 초를 반환합니다.
+    짧은 항목은 timeit 과 같이 한 표본이 min_sample 초 이상이 되도록 여러 번 묶어 실행합니다.
+    """
+    start = time.perf_counter()
+    fn()
+    first = time.perf_counter() - start
+    loops = max(1, int(min_sample / first)) if first > 0 else 1000
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        samples.append((time.perf_counter() - start) / loops)
+    return min(samples), statistics.median(samples)
+
+
+def check_size_search(image, save_path, limit_mb, logger):
+    """_save_optimized 가 실제로 용량 제한 탐색(2회 이상 인코딩)을 수행하고 제한 이하로 저장했는지 확인합니다."""
+    metrics = RunMetrics()
+    ImageHandler(logger, metrics=metrics)._save_optimized(image, save_path, max_mb=limit_mb)
+    encodes = metrics.raw()[1].get('encode_iterations', 0)
+    size_mb = os.path.getsize(save_path) / 1024 / 1024
+    if encodes < 2 or size_mb > limit_mb:
+        raise RuntimeError(f"용량 제한 탐색이 실행되지 않았습니다 ({os.path.basename(save_path)}: "
+                           f"인코딩 {encodes}회, {size_mb:.3f}MB / 제한 {limit_mb:.3f}MB)")
+
+
+def run_benchmarks(quick=False, repeat=5, seed=20240601):
+    rng = random.Random(seed)
+    logger = _logger()
+    dict_sizes = [100, 1000] if quick else [100, 1000, 10000, 100000]
+    page_sizes = [500, 2000] if quick else [2000, 10000]
+    results = {}
+
+    def record(name, fn, n=repeat):
+        best, median = measure(fn, n)
+        results[name] = {"min": round(best, 6), "median": round(median, 6)}
+        print(f"  {name:<48} min {best * 1000:10.2f} ms   median {median * 1000:10.2f} ms")
+
+    post_proc = PostProcessor({}, logger)
+
+    print("[bench] PostProcessor")
+    for dict_size in dict_sizes:
+        post_proc.master_data = make_keywords(rng, dict_size)
+        record(f"prepare_patterns[dict={dict_size}]", lambda: post_proc._prepare_patterns(),
+               n=1 if dict_size >= 100000 else repeat)
+        post_proc.matcher = post_proc._prepare_patterns()
+
+        for n_words in page_sizes:
+            descriptions, boxes = make_page(rng, post_proc.master_data, n_words)
+            table = WordTable.from_columns(descriptions, boxes)
+            lines = post_proc._group_into_lines(table)
+            texts = [line['text'] for line in lines]
+            tag = f"dict={dict_size},words={n_words}"
+
+            if dict_size == dict_sizes[0]:
+                # 줄 묶기는 사전 크기와 무관하므로 페이지 크기별로 한 번만 측정
+                record(f"group_into_lines[words={n_words}]", lambda: post_proc._group_into_lines(table))
+
+            record(f"find_all_matches[{tag}]", lambda: [post_proc._find_all_matches(t) for t in texts])
+
+            found = [(line, post_proc._find_all_matches(line['text'])) for line in lines]
+            pairs = [(line, m['match']) for line, matches in found for m in matches]
+            record(f"get_match_bbox[{tag}]",
+                   lambda: [post_proc._get_match_bbox(table, line, m) for line, m in pairs])
+
+    print("[bench] ImageHandler")
+    img_handler = ImageHandler(logger)
+    with tempfile.TemporaryDirectory() as tmp:
+        n_images, height = (3, 2000) if quick else (6, 4000)
+        paths = make_images(rng, tmp, n_images, 860, height)
+        out_png = os.path.join(tmp, "merged.png")
+        record(f"merge_and_save[images={n_images}x860x{height}]",
+               lambda: img_handler.merge_and_save(paths, out_png), n=max(1, repeat // 2))
+
+        with Image.open(paths[0]) as src:
+            page = src.convert("RGB")
+        tall = Image.new("RGB", (page.width, page.height * n_images), "white")
+        for i in range(n_images):
+            tall.paste(page, (0, i * page.height))
+        photo = add_texture(rng, page)
+        # 용량 제한 탐색이 실제로 일어나도록 각 입력의 1차 인코딩 크기의 절반을 제한으로 사용 (하한 없음)
+        cases = (("jpg", "JPEG", tall, {"quality": 95, "optimize": True}), ("png", "PNG", photo, {}))
+        for ext, fmt, image, options in cases:
+            buf = io.BytesIO()
+            image.save(buf, format=fmt, **options)
+            limit_mb = buf.tell() / 1024 / 1024 * 0.5
+            save_path = os.path.join(tmp, f"opt.{ext}")
+            check_size_search(image, save_path, limit_mb, logger)
+            record(f"save_optimized[{ext},{image.width}x{image.height},limit=50%]",
+                   lambda: img_handler._save_optimized(image, save_path, max_mb=limit_mb),
+                   n=max(1, repeat // 2))
+    return results
+
+
+def environment():
+    """기준값과 함께 저장하는 실행 환경 정보 (다르면 시간 비교가 의미 없음)"""
+    return {"python": platform.python_version(), "machine": platform.machine(),
+            "processor": platform.processor(), "cpus": os.cpu_count()}
+
+
+def environment_mismatch(baseline):
+    """기준값에 기록된 항목 중 현재 환경과 다른 것: [(항목, 기준값, 현재값), ...]"""
+    return [(key, baseline[key], value) for key, value in environment().items()
+            if key in baseline and baseline[key] != value]
+
+
+def compare(results, baseline, threshold):
+    """기준값 대비 최소 시간 비율을 출력하고, 임계 배율을 넘은 항목 목록을 반환합니다. (최소값이 잡음에 가장 덜 민감)"""
+    regressions = []
+    print(f"[bench] 기준값 비교 (임계 {threshold:.2f}x)")
+    for name, cur in results.items():
+        base = baseline.get(name)
+        if not base or not base.get("min"):
+            print(f"  {name:<48} (기준값 없음)")
+            continue
+        ratio = cur["min"] / base["min"]
+        flag = "REGRESSION" if ratio > threshold else "ok"
+        print(f"  {name:<48} {ratio:6.2f}x  {flag}")
+        if ratio > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="NS-Google_Vision 후처리/이미지 저장 오프라인 벤치마크")
+    parser.add_argument("--quick", action="store_true", help="작은 입력으로 빠르게 실행")
+    parser.add_argument("--repeat", type=int, default=5, help="항목별 반복 횟수")
+    parser.add_argument("--save-baseline", action="store_true", help="현재 결과를 기준값으로 저장")
+    parser.add_argument("--baseline", default=None, help="기준값 JSON 경로 (기본: bench/baseline.json, --quick 이면 bench/baseline_quick.json)")
+    parser.add_argument("--threshold", type=float, default=1.3, help="회귀로 판단할 최소 시간 배율")
+    args = parser.parse_args(argv)
+
+    if args.baseline is None:
+        args.baseline = QUICK_BASELINE_PATH if args.quick else BASELINE_PATH
+    results = run_benchmarks(quick=args.quick, repeat=max(1, args.repeat))
+
+    if args.save_baseline:
+        data = dict(environment(), quick=args.quick, results=results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        print(f"[bench] 기준값 저장: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"[bench] 기준값 파일 없음: {args.baseline} (--save-baseline 으로 생성)")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if bool(baseline.get("quick", False)) != args.quick:
+        mode = lambda quick: "--quick" if quick else "전체"
+        print(f"[bench] 비교 불가: 기준값은 {mode(baseline.get('quick', False))} 모드, 현재는 {mode(args.quick)} 모드로 측정되었습니다. "
+              f"같은 모드의 기준값을 지정하거나 --save-baseline 으로 새로 만드십시오. ({args.baseline})")
+        return 2
+    mismatch = environment_mismatch(baseline)
+    regressions = compare(results, baseline.get("results", {}), args.threshold)
+    if mismatch:
+        print("[bench] " + "!" * 60)
+        print("[bench] 경고: 기준값과 실행 환경이 다릅니다. 시간 비율은 참고용이며 회귀로 판정하지 않습니다.")
+        for key, base, cur in mismatch:
+            print(f"[bench]   {key}: 기준값 {base} / 현재 {cur}")
+        print("[bench] 이 환경의 기준값이 필요하면 --save-baseline --baseline <경로> 로 저장하십시오.")
+        print("[bench] " + "!" * 60)
+        return 0
+    if regressions:
+        print(f"[bench] 회귀 {len(regressions)}건: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
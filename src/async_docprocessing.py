@@ -0,0 +1,129 @@
+import os
+import io
+import time
+import asyncio
+import threading
+from google.cloud import vision
+from ocr_result import OcrResult
+from flow_control import raise_for_response_error
+
+
+class AsyncDocProcessor:
+    """
+    [Step 2: Document Processing] asyncio 기반 OCR 실행기입니다.
+    - 전용 이벤트 루프 스레드 하나에서 비동기 Vision 클라이언트(채널 1개)를 모든 상품이 공유합니다.
+    - 이미지 1장 = 태스크 1개. 전역 세마포어(concurrency)로 동시 요청 수를 제한합니다.
+    - 상품 워커 스레드는 run_many() 로 이미지들을 제출하고, 결과를 입력 순서대로 돌려받습니다.
+    - 캐시/JSON 저장 규칙은 DocProcessor 와 동일하게 공유합니다.
+    """
+
+    def __init__(self, doc_proc, logger, concurrency=8, client_factory=None):
+        self.doc_proc = doc_proc
+        self.logger = logger
+        self.concurrency = max(1, int(concurrency))
+        self._client_factory = client_factory or doc_proc.backend.create_async_client
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="OCR_Async", daemon=True)
+        self._thread.start()
+        try:
+            asyncio.run_coroutine_threadsafe(self._open(), self._loop).result()
+            self.logger.info(f"[OCR] 비동기 OCR 엔진 시작 (전역 동시 요청 수: {self.concurrency})")
+        except Exception as e:
+            self.logger.error(f"[OCR] 비동기 클라이언트 생성 실패: {e}")
+            self.close()
+            raise e
+
+    async def _open(self):
+        # 클라이언트/세마포어는 반드시 이벤트 루프 안에서 생성해야 합니다.
+        self.client = self._client_factory()
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+
+    def _read(self, image_path):
+        with io.open(image_path, 'rb') as image_file:
+            return image_file.read()
+
+    async def _ocr_one(self, image_path, save_json_path):
+        loop = asyncio.get_running_loop()
+        file_name = os.path.basename(image_path)
+        doc_proc = self.doc_proc
+        metrics = doc_proc.metrics
+        start_time = time.time()
+
+        try:
+            content = await loop.run_in_executor(None, self._read, image_path)
+
+            cache_key = doc_proc.cache.make_key(content, doc_proc.ocr_options) if doc_proc.cache else None
+            result = doc_proc.cache.get(cache_key) if doc_proc.cache else None
+
+            if result is None and doc_proc._needs_tiling(content):
+                # 타일 분할 대상: 타일 병렬 요청은 DocProcessor 의 스레드 풀에서 수행
+                async with self._semaphore:
+                    response = await loop.run_in_executor(None, doc_proc._ocr_content, content, file_name)
+                result = OcrResult.from_response(response)
+                if doc_proc.cache:
+                    await loop.run_in_executor(None, doc_proc.cache.put, cache_key, result)
+            elif result is None:
+                upload, factors = await loop.run_in_executor(None, doc_proc._prepare_upload, content, file_name)
+                feature = vision.Feature(type_=vision.Feature.Type.DOCUMENT_TEXT_DETECTION)
+                request = vision.AnnotateImageRequest(image=vision.Image(content=upload), features=[feature])
+
+                async def annotate(timeout):
+                    metrics.count('api_calls')
+                    metrics.count('bytes_uploaded', len(upload))
+                    async with self._semaphore:
+                        # retry=None: 클라이언트 기본 재시도를 끄고 흐름 제어(FlowController)에서만 재시도/오류 분류
+                        batch_response = await self.client.batch_annotate_images(requests=[request], retry=None, timeout=timeout)
+                    response = batch_response.responses[0]
+                    raise_for_response_error(response)
+                    return response
+
+                # 흐름 제어(속도 제한/AIMD 동시 요청 수/재시도)는 DocProcessor 와 공유 (백오프 대기 중에는 세마포어를 잡지 않음)
+                response = await doc_proc.flow.acall(annotate, label=file_name)
+
+                if factors:
+                    doc_proc._restore_coordinates(response, factors)
+
+                result = OcrResult.from_response(response)
+                if doc_proc.cache:
+                    await loop.run_in_executor(None, doc_proc.cache.put, cache_key, result)
+            else:
+                self.logger.info(f"[OCR] 캐시 적중 -> API 호출 생략 ({file_name})")
+
+            # JSON 직렬화는 CPU 작업이므로 이벤트 루프 밖에서 수행
+            await loop.run_in_executor(None, doc_proc._save_json, result, save_json_path, file_name,
+                                       OcrResult.digest(content))
+            metrics.observe('ocr', time.time() - start_time, product=doc_proc.product_of(image_path), image=file_name)
+            return result
+
+        except Exception as e:
+            metrics.count('ocr_failures')
+            self.logger.error(f"[OCR] 처리 실패 ('{file_name}'): {e}")
+            return e
+
+    async def _gather(self, jobs):
+        return await asyncio.gather(*(self._ocr_one(p, j) for p, j in jobs))
+
+    def run_many(self, jobs):
+        """
+        상품 워커 스레드에서 호출합니다. jobs: [(image_path, save_json_path), ...]
+        반환: jobs 와 같은 순서의 리스트. 각 원소는 OcrResult 또는 해당 이미지의 Exception 입니다.
+        """
+        if not jobs: return []
+        return asyncio.run_coroutine_threadsafe(self._gather(jobs), self._loop).result()
+
+    async def _shutdown(self):
+        transport = getattr(getattr(self, 'client', None), 'transport', None)
+        if transport is not None and hasattr(transport, 'close'):
+            try: await transport.close()
+            except Exception: pass
+
+    def close(self):
+        if self._loop.is_closed(): return
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result(timeout=10)
+        except Exception:
+            pass
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=10)
+        self._loop.close()
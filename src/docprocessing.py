@@ -1,56 +1,455 @@
 import os
 import io
 import time
-import json
+from concurrent.futures import ThreadPoolExecutor
 from google.cloud import vision
-from google.protobuf.json_format import MessageToDict
+from PIL import Image
+from ocr_result import OcrResult
+from metrics import NULL_METRICS
+from ocr_backends import VisionBackend
+from flow_control import FlowController, raise_for_response_error, classify_error
 
 class DocProcessor:
-    def __init__(self, key_path, logger):
+    # OCR 캐시 키에 포함되는 요청 기능/옵션 (요청 방식이 바뀌면 캐시도 자동으로 분리됩니다)
+    OCR_OPTIONS = {"feature": "DOCUMENT_TEXT_DETECTION"}
+
+    # batch_annotate_images 1회 요청당 이미지 수 상한 (Vision API 제한)
+    MAX_BATCH_IMAGES = 16
+    # 1회 배치 요청의 이미지 바이트 합계 상한 (요청 크기 제한 여유분 포함)
+    MAX_BATCH_BYTES = 8 * 1024 * 1024
+
+    def __init__(self, key_path, logger, cache=None, client=None, batch_size=MAX_BATCH_IMAGES,
+                 max_side=None, max_pixels=None, upload_quality=85,
+                 tile_threshold=None, tile_height=2000, tile_overlap=200, tile_workers=4, metrics=None, backend=None, flow=None):
         self.logger = logger
+        self.cache = cache
+        self.metrics = metrics or NULL_METRICS
+
+        # 업로드 전 다운스케일 설정 (None 이면 원본 바이트 그대로 전송)
+        self.max_side = max_side
+        self.max_pixels = max_pixels
+        self.upload_quality = upload_quality
+        self.ocr_options = dict(self.OCR_OPTIONS)
+        if max_side or max_pixels:
+            self.ocr_options.update({"max_side": max_side, "max_pixels": max_pixels, "upload_quality": upload_quality})
+
+        # 세로로 긴 상세페이지 타일 분할 설정 (이미지 높이가 tile_threshold 를 넘으면 겹치는 가로 띠로 나눠 OCR)
+        self.tile_threshold = tile_threshold
+        self.tile_height = tile_height
+        self.tile_overlap = tile_overlap
+        self.tile_workers = tile_workers
+        if tile_threshold:
+            # 겹침이 타일 높이 이상이면 타일 간격이 1px 로 줄어 수천 개의 (과금되는) 요청이 발생하므로 시작 시 거부합니다.
+            if int(tile_height) <= 0:
+                raise ValueError(f"타일 높이(tile_height)는 0보다 커야 합니다: {tile_height}")
+            if not 0 <= int(tile_overlap) < int(tile_height):
+                raise ValueError(f"타일 겹침(tile_overlap)은 0 이상, 타일 높이({tile_height}) 미만이어야 합니다: {tile_overlap}")
+            self.ocr_options.update({"tile_threshold": tile_threshold, "tile_height": tile_height, "tile_overlap": tile_overlap})
+        # 사이드카에 기록하는 옵션 지문 (캐시 사전 적재 시 같은 옵션으로 만든 결과인지 확인)
+        self.options_sha256 = OcrResult.options_digest(self.ocr_options)
+
+        self.batch_size = max(1, min(int(batch_size), self.MAX_BATCH_IMAGES))
+        # API 호출 흐름 제어 (속도 제한, AIMD 동시 요청 수, 할당량 초과/일시 장애 재시도) - 모든 워커가 공유
+        self.flow = flow or FlowController(logger, metrics=self.metrics)
+        # 비동기 OCR 엔진(AsyncDocProcessor)이 연결되면 run_many 가 이를 사용합니다.
+        self.async_runner = None
+        # 유사 중복 이미지 색인(NearDuplicateIndex)이 연결되면 그룹당 OCR 을 한 번만 수행합니다.
+        self.dedup = None
+        # OCR 백엔드: 실제 Vision(기본) / 사이드카 리플레이 / REST 호환 엔드포인트(로컬 가짜 서버)
+        self.backend = backend or VisionBackend(key_path, logger)
+        if client is not None:
+            # 테스트/로컬 환경: 주입된 클라이언트 사용 (인증 생략)
+            self.client = client
+            return
         try:
-            os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = key_path
-            self.client = vision.ImageAnnotatorClient()
-            self.logger.info("[OCR] Google Vision API 클라이언트 인증 성공")
+            self.client = self.backend.create_client()
         except Exception as e:
             self.logger.error(f"[OCR] API 인증 실패: {e}")
             raise e
 
-    def run(self, image_path, save_json_path=None):
+    def warm_cache(self, pairs):
+        """기존 '*_ocr.json' 결과로 OCR 캐시를 미리 채웁니다. pairs: [(이미지 경로, json 경로), ...]"""
+        if self.cache:
+            self.cache.warm_from_sidecars(pairs, self.ocr_options, legacy_options=self.OCR_OPTIONS)
+
+    def run(self, image_path, save_json_path=None, content=None):
         """
         이미지를 받아 문서 특화 OCR(Document Text Detection)을 수행합니다.
+        - OCR 캐시가 설정된 경우, 동일한 이미지 바이트는 API 호출 없이 캐시 결과를 반환합니다.
+        - content 가 주어지면 (파이프라인의 읽기 단계에서 이미 읽은 바이트) 파일을 다시 읽지 않습니다.
         """
+        if self.dedup is not None:
+            return self._run_deduplicated(image_path, save_json_path, content)
+        return self._run(image_path, save_json_path, content)
+
+    def _run_deduplicated(self, image_path, save_json_path, content=None):
+        """유사 이미지 그룹의 첫 요청만 OCR 하고, 나머지는 그 결과를 좌표 환산해 사용합니다."""
+        leader, future = self.dedup.claim(image_path)
+        if not leader:
+            result = self.dedup.follow(image_path, future)
+            if result is not None:
+                self._save_json(result, save_json_path, os.path.basename(image_path), self.dedup.image_sha256(image_path))
+                return result
+            # 대표 이미지 OCR 실패 또는 픽셀 비교 불일치 -> 직접 OCR
+            return self._run(image_path, save_json_path, content)
+        try:
+            result = self._run(image_path, save_json_path, content)
+        except Exception as e:
+            self.dedup.publish(image_path, future, error=e)
+            raise
+        self.dedup.publish(image_path, future, result=result)
+        return result
+
+    def _run(self, image_path, save_json_path=None, content=None):
         file_name = os.path.basename(image_path)
         start_time = time.time()
 
         try:
-            with io.open(image_path, 'rb') as image_file:
-                content = image_file.read()
+            if content is None:
+                with io.open(image_path, 'rb') as image_file:
+                    content = image_file.read()
 
-            image = vision.Image(content=content)
-            
-            # [핵심 수정] text_detection -> document_text_detection 으로 변경
-            # 문서나 빽빽한 텍스트 인식률이 훨씬 좋습니다.
-            response = self.client.document_text_detection(image=image)
-            
-            if response.error.message:
-                raise Exception(f"Google API 반환 에러: {response.error.message}")
+            cache_key = self.cache.make_key(content, self.ocr_options) if self.cache else None
+            result = self.cache.get(cache_key) if self.cache else None
 
-            # JSON 파일 저장 (한글 보존 + 들여쓰기)
-            if save_json_path:
-                try:
-                    response_dict = MessageToDict(response._pb) if hasattr(response, '_pb') else MessageToDict(response)
-                    with open(save_json_path, "w", encoding="utf-8") as f:
-                        json.dump(response_dict, f, ensure_ascii=False, indent=4)
-                except Exception as json_e:
-                    self.logger.warning(f"[OCR] JSON 저장 실패 ({file_name}): {json_e}")
+            if result is None:
+                # OCR 경계에서 응답을 한 번만 경량 결과(OcrResult)로 변환합니다.
+                result = OcrResult.from_response(self._ocr_content(content, file_name))
+                if self.cache:
+                    self.cache.put(cache_key, result)
+            else:
+                self.logger.info(f"[OCR] 캐시 적중 -> API 호출 생략 ({file_name})")
+
+            self._save_json(result, save_json_path, file_name, OcrResult.digest(content))
 
             elapsed = time.time() - start_time
-            
-            # document_text_detection도 결과 포맷(text_annotations)은 호환되므로
-            # 기존 postprocessing.py를 수정할 필요 없이 그대로 쓸 수 있습니다.
-            return response.text_annotations
+            self.metrics.observe('ocr', elapsed, product=self.product_of(image_path), image=file_name)
+
+            return result
 
         except Exception as e:
+            self.metrics.count('ocr_failures')
             self.logger.error(f"[OCR] 처리 실패 ('{file_name}'): {e}")
-            raise e
\ No newline at end of file
+            raise e
+
+    @staticmethod
+    def product_of(image_path):
+        """이미지 경로의 상위 폴더명 (= 상품 코드, 지표 라벨용)"""
+        return os.path.basename(os.path.dirname(image_path))
+
+    def _ocr_content(self, content, file_name):
+        """이미지 바이트 1건을 OCR 합니다. (세로로 긴 이미지는 타일 분할, 필요 시 업로드 축소 후 원본 좌표 복원)"""
+        if self._needs_tiling(content):
+            return self._ocr_tiled(content, file_name)
+        return self._ocr_content_single(content, file_name)
+
+    def _needs_tiling(self, content):
+        if not self.tile_threshold:
+            return False
+        try:
+            with Image.open(io.BytesIO(content)) as img:
+                return img.height > self.tile_threshold
+        except Exception:
+            return False
+
+    def _ocr_tiled(self, content, file_name):
+        """
+        세로로 긴 이미지를 겹치는 가로 타일로 나눠 병렬 OCR 한 뒤, 전체 이미지 좌표의 text_annotations 로 합칩니다.
+        - 각 단어는 중심점이 속한 타일의 '중앙 구간'(겹침 띠의 절반씩을 제외한 구간)에서만 채택하여 중복을 제거합니다.
+        - 결과의 0번 항목은 기존과 같이 전체 텍스트, 1번부터는 단어 단위입니다.
+        """
+        with Image.open(io.BytesIO(content)) as img:
+            img = img.convert('RGB')
+            width, height = img.size
+            step = self.tile_height - self.tile_overlap
+            tops = list(range(0, max(height - self.tile_overlap, 1), step))
+            tiles = []
+            for top in tops:
+                bottom = min(top + self.tile_height, height)
+                buf = io.BytesIO()
+                img.crop((0, top, width, bottom)).save(buf, format='JPEG', quality=95)
+                tiles.append((top, bottom, buf.getvalue()))
+
+        self.logger.info(f"[OCR] 타일 분할 ({file_name}): {width}x{height} -> {len(tiles)}개 타일 (겹침 {self.tile_overlap}px)")
+
+        def ocr_tile(tile):
+            top, bottom, tile_bytes = tile
+            return self._ocr_content_single(tile_bytes, f"{file_name}@{top}")
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.tile_workers, len(tiles))), thread_name_prefix="OCR_Tile") as pool:
+            tile_responses = list(pool.map(ocr_tile, tiles))
+
+        half = self.tile_overlap / 2
+        words, texts = [], []
+        for i, ((top, bottom, _), tile_response) in enumerate(zip(tiles, tile_responses)):
+            core_top = top + half if i > 0 else 0
+            core_bottom = bottom - half if i < len(tiles) - 1 else height
+            tile_words = []
+            for ann in list(tile_response.text_annotations)[1:]:
+                ys = [v.y + top for v in ann.bounding_poly.vertices]
+                if not ys: continue
+                center_y = (min(ys) + max(ys)) / 2
+                if not (core_top <= center_y < core_bottom): continue
+                vertices = [vision.Vertex(x=v.x, y=v.y + top) for v in ann.bounding_poly.vertices]
+                tile_words.append(vision.EntityAnnotation(description=ann.description, locale=ann.locale,
+                                                          bounding_poly=vision.BoundingPoly(vertices=vertices)))
+            words.extend(tile_words)
+            if tile_words:
+                texts.append(" ".join(w.description for w in tile_words))
+
+        full_text = "\n".join(texts)
+        full_poly = vision.BoundingPoly(vertices=[vision.Vertex(x=0, y=0), vision.Vertex(x=width, y=0),
+                                                  vision.Vertex(x=width, y=height), vision.Vertex(x=0, y=height)])
+        header = vision.EntityAnnotation(description=full_text, bounding_poly=full_poly)
+        return vision.AnnotateImageResponse(text_annotations=[header] + words,
+                                            full_text_annotation=vision.TextAnnotation(text=full_text))
+
+    def _ocr_content_single(self, content, file_name):
+        """이미지(또는 타일) 1장을 단일 요청으로 OCR 합니다. (업로드 축소/좌표 복원 포함)"""
+        upload, factors = self._prepare_upload(content, file_name)
+        response = self._annotate_upload(upload, file_name)
+
+        # 다운스케일 업로드였다면 모든 좌표를 원본 이미지 기준으로 복원 (캐시/JSON 도 원본 좌표로 저장)
+        if factors:
+            self._restore_coordinates(response, factors)
+        return response
+
+    def _annotate_upload(self, upload, file_name):
+        """업로드 바이트 1건을 흐름 제어/재시도와 함께 document_text_detection 으로 요청합니다."""
+        image = vision.Image(content=upload)
+
+        def request(timeout):
+            self.metrics.count('api_calls')
+            self.metrics.count('bytes_uploaded', len(upload))
+            # [핵심 수정] text_detection -> document_text_detection 으로 변경
+            # 문서나 빽빽한 텍스트 인식률이 훨씬 좋습니다.
+            response = self.client.document_text_detection(image=image, retry=None, timeout=timeout)
+            raise_for_response_error(response)
+            return response
+
+        return self.flow.call(request, label=file_name)
+
+    def _prepare_upload(self, content, file_name):
+        """
+        업로드 전 다운스케일/재압축을 수행합니다. (긴 변 max_side, 총 픽셀 max_pixels 상한)
+        반환: (업로드 바이트, (sx, sy)) - sx/sy 는 업로드 이미지 좌표를 원본 좌표로 되돌리는 배율이며, 축소하지 않았다면 None 입니다.
+        """
+        if not (self.max_side or self.max_pixels):
+            return content, None
+        try:
+            with Image.open(io.BytesIO(content)) as img:
+                w, h = img.size
+                scale = 1.0
+                if self.max_side: scale = min(scale, self.max_side / max(w, h))
+                if self.max_pixels: scale = min(scale, (self.max_pixels / (w * h)) ** 0.5)
+                if scale >= 1.0:
+                    return content, None
+                new_w, new_h = max(1, int(w * scale)), max(1, int(h * scale))
+                resized = img.convert('RGB').resize((new_w, new_h), Image.Resampling.LANCZOS)
+
+            buf = io.BytesIO()
+            resized.save(buf, format='JPEG', quality=self.upload_quality)
+            upload = buf.getvalue()
+            self.logger.info(f"[OCR] 업로드 축소 ({file_name}): {w}x{h} -> {new_w}x{new_h}, "
+                             f"{len(content)/1024:.0f}KB -> {len(upload)/1024:.0f}KB")
+            return upload, (w / new_w, h / new_h)
+        except Exception as e:
+            self.logger.warning(f"[OCR] 업로드 축소 실패 -> 원본 전송 ({file_name}): {e}")
+            return content, None
+
+    @staticmethod
+    def _restore_coordinates(response, factors):
+        """축소 업로드 결과의 모든 bounding_poly/bounding_box 꼭짓점을 원본 이미지 좌표로 되돌립니다."""
+        sx, sy = factors
+        pb = response._pb if hasattr(response, '_pb') else response
+
+        def scale_poly(poly):
+            for v in poly.vertices:
+                v.x = int(round(v.x * sx))
+                v.y = int(round(v.y * sy))
+
+        for ann in pb.text_annotations:
+            scale_poly(ann.bounding_poly)
+        for page in pb.full_text_annotation.pages:
+            page.width = int(round(page.width * sx))
+            page.height = int(round(page.height * sy))
+            for block in page.blocks:
+                scale_poly(block.bounding_box)
+                for paragraph in block.paragraphs:
+                    scale_poly(paragraph.bounding_box)
+                    for word in paragraph.words:
+                        scale_poly(word.bounding_box)
+                        for symbol in word.symbols:
+                            scale_poly(symbol.bounding_box)
+
+    def _save_json(self, result, save_json_path, file_name, image_sha256=None):
+        # JSON 사이드카 저장 (한글 보존, 들여쓰기 없는 열 단위 압축 형식 - OcrResult.load 로 복원)
+        # 원본 이미지 해시와 OCR 옵션 지문을 함께 기록해 캐시 사전 적재 시 이미지 교체/옵션 변경 여부를 확인합니다.
+        if not save_json_path: return
+        try:
+            result.save(save_json_path, image_sha256, self.options_sha256)
+        except Exception as json_e:
+            self.logger.warning(f"[OCR] JSON 저장 실패 ({file_name}): {json_e}")
+
+    def _make_batches(self, entries):
+        """(인덱스, 이미지 바이트) 목록을 이미지 수/바이트 상한에 맞춰 묶습니다."""
+        batches, current, current_bytes = [], [], 0
+        for idx, content in entries:
+            if current and (len(current) >= self.batch_size or current_bytes + len(content) > self.MAX_BATCH_BYTES):
+                batches.append(current)
+                current, current_bytes = [], 0
+            current.append((idx, content))
+            current_bytes += len(content)
+        if current: batches.append(current)
+        return batches
+
+    def run_many(self, jobs):
+        """
+        여러 이미지의 OCR 을 한 번에 수행합니다. (비동기 엔진이 연결되어 있으면 비동기, 아니면 배치 요청)
+        반환 형식은 run_batch 와 같습니다.
+        """
+        if self.dedup is not None:
+            return self._run_many_deduplicated(jobs)
+        return self._run_many(jobs)
+
+    def _run_many(self, jobs):
+        if self.async_runner is not None:
+            return self.async_runner.run_many(jobs)
+        return self.run_batch(jobs)
+
+    def _run_many_deduplicated(self, jobs):
+        """
+        유사 이미지 그룹의 첫 요청인 이미지만 모아 OCR 하고 결과를 공유한 뒤, 나머지는 대표 결과를 기다려 좌표 환산합니다.
+        (대표 결과를 먼저 공유하고 나서 기다리므로 상품끼리 서로의 대표를 기다려도 교착되지 않습니다)
+        """
+        results = [None] * len(jobs)
+        leaders, followers = [], []
+        for idx, (image_path, _) in enumerate(jobs):
+            is_leader, future = self.dedup.claim(image_path)
+            (leaders if is_leader else followers).append((idx, future))
+
+        try:
+            leader_results = self._run_many([jobs[idx] for idx, _ in leaders]) if leaders else []
+        except Exception as e:
+            for idx, future in leaders:
+                self.dedup.publish(jobs[idx][0], future, error=e)
+            raise
+        for (idx, future), result in zip(leaders, leader_results):
+            if isinstance(result, Exception):
+                self.dedup.publish(jobs[idx][0], future, error=result)
+            else:
+                self.dedup.publish(jobs[idx][0], future, result=result)
+            results[idx] = result
+
+        for idx, future in followers:
+            image_path, save_json_path = jobs[idx]
+            result = self.dedup.follow(image_path, future)
+            if result is None:
+                # 대표 이미지 OCR 실패 또는 픽셀 비교 불일치 -> 직접 OCR
+                result = self._run_many([jobs[idx]])[0]
+            else:
+                self._save_json(result, save_json_path, os.path.basename(image_path), self.dedup.image_sha256(image_path))
+            results[idx] = result
+        return results
+
+    def run_batch(self, jobs):
+        """
+        여러 이미지를 batch_annotate_images 로 묶어 OCR 을 수행합니다.
+        - jobs: [(image_path, save_json_path), ...]
+        - 반환: jobs 와 같은 순서의 리스트. 각 원소는 OcrResult 또는 해당 이미지의 Exception 입니다.
+        - 한 이미지의 실패가 같은 배치의 다른 이미지에 영향을 주지 않습니다.
+        """
+        results = [None] * len(jobs)
+        responses = [None] * len(jobs)
+        digests = [None] * len(jobs)
+        pending = []
+
+        for idx, (image_path, _) in enumerate(jobs):
+            file_name = os.path.basename(image_path)
+            try:
+                with io.open(image_path, 'rb') as image_file:
+                    content = image_file.read()
+            except Exception as e:
+                self.logger.error(f"[OCR] 처리 실패 ('{file_name}'): {e}")
+                results[idx] = e
+                continue
+
+            digests[idx] = OcrResult.digest(content)
+            cache_key = self.cache.make_key(content, self.ocr_options) if self.cache else None
+            cached = self.cache.get(cache_key) if self.cache else None
+            if cached is not None:
+                self.logger.info(f"[OCR] 캐시 적중 -> API 호출 생략 ({file_name})")
+                responses[idx] = cached
+            elif self._needs_tiling(content):
+                # 타일 분할 대상은 배치에 넣지 않고 타일 단위 병렬 요청으로 처리
+                try:
+                    result = OcrResult.from_response(self._ocr_content(content, file_name))
+                    if self.cache:
+                        self.cache.put(cache_key, result)
+                    responses[idx] = result
+                except Exception as e:
+                    self.logger.error(f"[OCR] 처리 실패 ('{file_name}'): {e}")
+                    results[idx] = e
+            else:
+                upload, factors = self._prepare_upload(content, file_name)
+                pending.append((idx, upload, cache_key, factors))
+
+        cache_keys = {idx: key for idx, _, key, _ in pending}
+        scale_factors = {idx: factors for idx, _, _, factors in pending}
+        batches = self._make_batches([(idx, upload) for idx, upload, _, _ in pending])
+        if batches:
+            self.logger.info(f"[OCR] 배치 요청: 이미지 {len(pending)}장 -> {len(batches)}회 호출")
+
+        feature = vision.Feature(type_=vision.Feature.Type.DOCUMENT_TEXT_DETECTION)
+        for batch in batches:
+            requests = [vision.AnnotateImageRequest(image=vision.Image(content=content), features=[feature])
+                        for _, content in batch]
+
+            def request(timeout, requests=requests, batch=batch):
+                self.metrics.count('api_calls')
+                self.metrics.count('bytes_uploaded', sum(len(content) for _, content in batch))
+                # retry=None: 클라이언트 기본 재시도를 끄고 흐름 제어(FlowController)에서만 재시도/오류 분류
+                return self.client.batch_annotate_images(requests=requests, retry=None, timeout=timeout)
+
+            try:
+                with self.metrics.timer('ocr_batch'):
+                    batch_response = self.flow.call(request, label=f"배치 {len(batch)}장")
+                batch_items = list(zip(batch, batch_response.responses))
+            except Exception as e:
+                # 배치 전체 실패 시: 이미지별 단건 요청으로 재시도하여 실패를 격리
+                self.logger.warning(f"[OCR] 배치 요청 실패 -> 단건 요청으로 전환 ({len(batch)}장): {e}")
+                batch_items = [((idx, content), None) for idx, content in batch]
+
+            for (idx, content), response in batch_items:
+                file_name = os.path.basename(jobs[idx][0])
+                try:
+                    if response is None:
+                        response = self._annotate_upload(content, file_name)
+                    elif response.error.message:
+                        try:
+                            raise_for_response_error(response)
+                        except Exception as err:
+                            # 이미지 단위 할당량 초과/일시 장애는 해당 이미지만 단건으로 재시도
+                            if classify_error(err) is None: raise
+                            response = self._annotate_upload(content, file_name)
+                except Exception as err:
+                    self.logger.error(f"[OCR] 처리 실패 ('{file_name}'): {err}")
+                    self.metrics.count('ocr_failures')
+                    results[idx] = err
+                    continue
+                if scale_factors[idx]:
+                    self._restore_coordinates(response, scale_factors[idx])
+                result = OcrResult.from_response(response)
+                if self.cache:
+                    self.cache.put(cache_keys[idx], result)
+                responses[idx] = result
+
+        for idx, result in enumerate(responses):
+            if result is None:
+                if results[idx] is None:
+                    results[idx] = Exception("배치 응답 누락")
+                continue
+            image_path, save_json_path = jobs[idx]
+            self._save_json(result, save_json_path, os.path.basename(image_path), digests[idx])
+            results[idx] = result
+        return results
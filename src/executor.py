@@ -5,15 +5,22 @@ import time
 import logging
 import traceback
 import re
+import itertools
 from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor
 
-from PIL import Image  # [추가] PNG -> JPG 안전한 변환 및 저장을 위해 추가
-
+# 무거운 의존성(google.cloud.vision/protobuf, numpy, PIL, openpyxl)은 해당 단계를 실행할 때 import 합니다.
+# (RPA 가 호출마다 새 인터프리터를 띄우므로 test_rpa / 인자 검증 실패는 즉시 반환)
 from preprocessing import PreProcessor
-from docprocessing import DocProcessor
-from postprocessing import PostProcessor
-from image_handler import ImageHandler
+from metrics import RunMetrics
+from run_manifest import RunManifest
+from findings_report import FindingsReport
+
+_run_seq = itertools.count(1)
+
+def new_run_id():
+    """분 단위 로그 폴더를 함께 쓰는 실행(같은 분의 재실행, 서비스 작업)들이 서로의 결과 파일을 덮어쓰지 않도록 실행마다 붙이는 ID"""
+    return f"{datetime.now().strftime('%H%M%S')}_{os.getpid()}_{next(_run_seq)}"
 
 def setup_logger(base_log_dir):
     try:
@@ -57,8 +64,55 @@ def setup_product_logger(product_code, output_dir):
     logger.addHandler(stream_handler)
     return logger
 
+# [Step 4: Data Export] 병합 이미지 및 엑셀 리포트 추출 (순차 실행/파이프라인 실행 공용)
+def export_product_results(product_code, product_output_dir, category, review_type, config,
+                           post_proc, img_handler, processed_img_paths, all_issues, logger):
+    if processed_img_paths:
+        active_t_name = config.get("active_t_name", "검사")
+        
+        if review_type == "사후":
+            target_dir = os.path.join(product_output_dir, active_t_name)
+            os.makedirs(target_dir, exist_ok=True)
+            img_filename = f"{category}_{review_type}_{active_t_name}리스트_Result_Image_BOX.png"
+        else:
+            target_dir = product_output_dir
+            img_filename = f"{category}_{review_type}_{active_t_name} 리스트_Result_Image_BOX.png"
+            
+        final_img_path = os.path.join(target_dir, img_filename)
+        
+        # 지정된 경로와 이름으로 이미지 병합 및 저장
+        img_handler.merge_and_save(processed_img_paths, final_img_path, product=product_code)
+
+        # ---------------------------------------------------------
+        # [추가된 로직] 사후 심의 & 금칙어인 경우 대표 이미지(Result_상품번호.jpg) 추출
+        # ---------------------------------------------------------
+        if review_type == "사후" and active_t_name == "금칙어":
+            root_img_filename = f"Result_{product_code}.jpg"
+            root_img_path = os.path.join(product_output_dir, root_img_filename)
+            try:
+                from PIL import Image
+                # 원본이 png일 수 있으므로 확장자 불일치를 막기 위해 PIL로 변환 후 저장
+                with Image.open(final_img_path) as img:
+                    img.convert('RGB').save(root_img_path, quality=95)
+                logger.info(f"[Data Export] 대표 이미지 복사 완료 (루트 경로): {root_img_filename}")
+            except Exception as img_e:
+                logger.error(f"[Data Export] 대표 이미지 복사 실패: {img_e}")
+        # ---------------------------------------------------------
+        
+        # 엑셀 저장
+        post_proc.save_excel(all_issues, product_output_dir, product_code, category=category, review_type=review_type, logger=logger)
+        # 실행 전체 통합 적발 내역(findings_<실행 ID>.csv)에 이 상품의 적발 행 추가
+        if config.get('findings'):
+            config['findings'].append(product_code, category, review_type, all_issues)
+
+        # 임시 파일 정리
+        for p in processed_img_paths:
+            if isinstance(p, str) and os.path.exists(p) and "temp_" in os.path.basename(p):
+                try: os.remove(p)
+                except: pass
+
 # [Main Processor] 4단계 파이프라인 총괄 실행 로직
-def process_single_product(product_folder_path, category, review_type, config, modules, main_logger):
+def process_single_product(product_folder_path, category, review_type, config, modules, main_logger, manifest=None):
     product_code = os.path.basename(product_folder_path)
     product_output_dir = os.path.join(config['base_output_dir'], product_code)
     os.makedirs(product_output_dir, exist_ok=True)
@@ -68,6 +122,7 @@ def process_single_product(product_folder_path, category, review_type, config, m
 
     try:
         pre_proc, doc_proc, post_proc, img_handler = modules
+        product_start = time.perf_counter()
         task = {"product_code": product_code, "category": category, "image_folder_path": product_folder_path}
 
         # [Step 1: Pre-processing] 데이터 및 폴더 스캔
@@ -76,8 +131,33 @@ def process_single_product(product_folder_path, category, review_type, config, m
             logger.warning("이미지 없음.")
             return {"code": product_code, "status": "SKIP"}
 
+        # 실행 매니페스트: 입력 이미지/마스터 사전/설정이 지난 완료 시점과 같으면 건너뜀
+        if manifest and manifest.begin(product_code, product_output_dir, [item['input_path'] for item in idp_items.values()],
+                                       post_proc.master_digest, config.get('manifest_settings'),
+                                       skip_unchanged=config.get('resume', False)):
+            logger.info("<<< [건너뜀] 입력/사전/설정 변경 없음 (이전 결과 유지)")
+            if config.get('findings'):
+                config['findings'].append_unchanged(product_code, manifest.findings(product_code))
+            return {"code": product_code, "status": "UNCHANGED"}
+
         processed_img_paths, all_issues = [], []
-        next_start_index = 1 
+        next_start_index = 1
+        failed_images = 0
+        post_pool = config.get('post_pool')
+        pending = []
+
+        # 이전 실행에서 남긴 '*_ocr.json' 으로 OCR 캐시 예열 (재검사 시 API 호출 0건)
+        doc_proc.warm_cache([(item['input_path'], os.path.join(product_output_dir, f"{item['file_name']}_ocr.json"))
+                             for item in idp_items.values()])
+
+        # [Step 2: Document Processing] 배치/비동기 모드: 상품 내 모든 이미지의 OCR 을 한꺼번에 요청
+        # (결과는 입력 순서대로 돌아오므로 이후 이슈 번호(start_index) 부여 순서는 그대로 유지됩니다)
+        batch_results = {}
+        if config.get('ocr_mode', 'single') != 'single':
+            item_list = list(idp_items.values())
+            jobs = [(item['input_path'], os.path.join(product_output_dir, f"{item['file_name']}_ocr.json")) for item in item_list]
+            for item, result in zip(item_list, doc_proc.run_many(jobs)):
+                batch_results[item['id']] = result
 
         for item_id, item in idp_items.items():
             try:
@@ -85,64 +165,128 @@ def process_single_product(product_folder_path, category, review_type, config, m
                 json_save_path = os.path.join(product_output_dir, json_filename)
 
                 # [Step 2: Document Processing] Google Vision API 호출
-                item['ocr_data'] = doc_proc.run(item['input_path'], save_json_path=json_save_path)
+                if item_id in batch_results:
+                    if isinstance(batch_results[item_id], Exception): raise batch_results[item_id]
+                    item['ocr_data'] = batch_results[item_id]
+                else:
+                    item['ocr_data'] = doc_proc.run(item['input_path'], save_json_path=json_save_path)
                 
                 # [Step 3: Post-processing] 텍스트 매칭 및 바운딩 박스 드로잉
-                issues, saved_path = post_proc.process_one_image(item, start_index=next_start_index, logger=logger)
+                # (프로세스 풀 모드: 상품 내 이미지를 모두 제출해 두고 아래에서 입력 순서대로 결과 수집)
+                if post_pool:
+                    pending.append((item, post_pool.submit(item, in_memory=config.get('in_memory_annotation', False))))
+                    continue
+                issues, saved_path = post_proc.process_one_image(item, start_index=next_start_index, logger=logger,
+                                                                 in_memory=config.get('in_memory_annotation', False))
                 
                 next_start_index += len(issues)
                 all_issues.extend(issues)
                 processed_img_paths.append(saved_path)
             except Exception as e:
+                failed_images += 1
+                logger.error(f"이미지 에러 ({item['file_name']}): {e}")
+
+        for item, future in pending:
+            try:
+                issues, saved_path = post_pool.result(future, logger)
+                all_issues.extend(issues)
+                processed_img_paths.append(saved_path)
+            except Exception as e:
+                failed_images += 1
                 logger.error(f"이미지 에러 ({item['file_name']}): {e}")
 
         # [Step 4: Data Export] 병합 이미지 및 엑셀 리포트 추출
-        if processed_img_paths:
-            active_t_name = config.get("active_t_name", "검사")
-            
-            if review_type == "사후":
-                target_dir = os.path.join(product_output_dir, active_t_name)
-                os.makedirs(target_dir, exist_ok=True)
-                img_filename = f"{category}_{review_type}_{active_t_name}리스트_Result_Image_BOX.png"
-            else:
-                target_dir = product_output_dir
-                img_filename = f"{category}_{review_type}_{active_t_name} 리스트_Result_Image_BOX.png"
-                
-            final_img_path = os.path.join(target_dir, img_filename)
-            
-            # 지정된 경로와 이름으로 이미지 병합 및 저장
-            img_handler.merge_and_save(processed_img_paths, final_img_path)
-
-            # ---------------------------------------------------------
-            # [추가된 로직] 사후 심의 & 금칙어인 경우 대표 이미지(Result_상품번호.jpg) 추출
-            # ---------------------------------------------------------
-            if review_type == "사후" and active_t_name == "금칙어":
-                root_img_filename = f"Result_{product_code}.jpg"
-                root_img_path = os.path.join(product_output_dir, root_img_filename)
-                try:
-                    # 원본이 png일 수 있으므로 확장자 불일치를 막기 위해 PIL로 변환 후 저장
-                    with Image.open(final_img_path) as img:
-                        img.convert('RGB').save(root_img_path, quality=95)
-                    logger.info(f"[Data Export] 대표 이미지 복사 완료 (루트 경로): {root_img_filename}")
-                except Exception as img_e:
-                    logger.error(f"[Data Export] 대표 이미지 복사 실패: {img_e}")
-            # ---------------------------------------------------------
-            
-            # 엑셀 저장
-            post_proc.save_excel(all_issues, product_output_dir, product_code, category=category, review_type=review_type, logger=logger)
-
-            # 임시 파일 정리
-            for p in processed_img_paths:
-                if os.path.exists(p) and "temp_" in os.path.basename(p):
-                    try: os.remove(p)
-                    except: pass
+        export_product_results(product_code, product_output_dir, category, review_type, config,
+                               post_proc, img_handler, processed_img_paths, all_issues, logger)
         
+        post_proc.metrics.observe('product', time.perf_counter() - product_start, product=product_code)
+        # 실패한 이미지가 있으면 완료로 기록하지 않아 다음 실행에서 다시 처리(재개)합니다.
+        if manifest and not failed_images:
+            manifest.complete(product_code, product_output_dir,
+                              FindingsReport.make_rows(product_code, category, review_type, all_issues))
         logger.info(f"<<< [완료] 적발: {len(all_issues)}건")
         return {"code": product_code, "status": "SUCCESS"}
     except Exception as e:
         logger.error(f"치명적 오류: {e}")
         return {"code": product_code, "status": "FAIL"}
 
+def create_ocr_backend(args, api_key_path, input_root, output_root, logger):
+    """
+    OCR 백엔드 선택 (strOcrBackend)
+    - vision (기본): 실제 Google Vision API
+    - replay: 이전 실행의 '*_ocr.json' 재생 (strOcrReplayPath, 기본값 = 출력 폴더)
+    - http: Vision REST 호환 엔드포인트 (strOcrEndpoint)
+    - fake: 로컬 가짜 Vision 서버를 띄워 http 로 연결 (strFakeLatencyMs, strFakeJitterMs, strFakeErrorRate, strFakeQuotaQps)
+    """
+    from ocr_backends import VisionBackend, ReplayBackend, HttpBackend
+
+    backend_name = str(args.get('strOcrBackend', 'vision')).lower()
+    if backend_name == 'replay':
+        return ReplayBackend(args.get('strOcrReplayPath') or output_root, input_root, logger)
+    if backend_name == 'http':
+        return HttpBackend(args.get('strOcrEndpoint', 'http://127.0.0.1:8787'), logger)
+    if backend_name == 'fake':
+        from fake_vision_server import FakeVisionServer
+        server = FakeVisionServer(latency_ms=float(args.get('strFakeLatencyMs', 300)),
+                                  jitter_ms=float(args.get('strFakeJitterMs', 100)),
+                                  error_rate=float(args.get('strFakeErrorRate', 0)),
+                                  quota_qps=int(args.get('strFakeQuotaQps', 0)), logger=logger).start()
+        return HttpBackend(server.endpoint, logger, server=server)
+    return VisionBackend(api_key_path, logger)
+
+# OCR 클라이언트/캐시/흐름 제어 구성에 영향을 주는 인자 (서비스 모드에서 재사용 여부 판단에 사용)
+OCR_STACK_ARGS = ('strOcrKey', 'strOcrBackend', 'strOcrEndpoint', 'strOcrReplayPath', 'strFakeLatencyMs', 'strFakeJitterMs',
+                  'strFakeErrorRate', 'strFakeQuotaQps', 'strOcrCacheMB', 'strOcrBatchSize', 'strOcrConcurrency',
+                  'strOcrMaxSide', 'strOcrMaxPixels', 'strOcrQuality', 'strOcrTileThreshold', 'strOcrTileHeight',
+                  'strOcrTileOverlap', 'strOcrQps', 'strOcrMaxInflight', 'strOcrMaxAttempts', 'strOcrDeadline')
+
+def build_ocr_stack(args, api_key_path, input_root, output_root, log_base_path, logger, metrics):
+    """[Step 2] OCR 캐시, 백엔드, 흐름 제어, DocProcessor (+비동기 엔진) 를 구성합니다."""
+    from ocr_cache import OCRCache
+    from docprocessing import DocProcessor
+    from async_docprocessing import AsyncDocProcessor
+    from flow_control import FlowController
+
+    ocr_cache = OCRCache(os.path.join(log_base_path, "_cache", "ocr"), logger,
+                         max_mb=int(args.get('strOcrCacheMB', 1024)))
+    ocr_batch_size = int(args.get('strOcrBatchSize', 1))
+    ocr_concurrency = int(args.get('strOcrConcurrency', 0))
+    # 업로드 전 다운스케일 (긴 변/총 픽셀 상한, 미지정 시 원본 전송)
+    ocr_max_side = int(args.get('strOcrMaxSide', 0)) or None
+    ocr_max_pixels = int(args.get('strOcrMaxPixels', 0)) or None
+    ocr_backend = create_ocr_backend(args, api_key_path, input_root, output_root, logger)
+    # API 호출 흐름 제어: 초당 요청 수(0=무제한), 최대 동시 요청 수(AIMD 상한), 시도 횟수, 이미지당 마감 시간(초)
+    ocr_flow = FlowController(logger, qps=float(args.get('strOcrQps', 0)),
+                              concurrency=int(args.get('strOcrMaxInflight', 8)),
+                              max_attempts=int(args.get('strOcrMaxAttempts', 5)),
+                              deadline=float(args.get('strOcrDeadline', 120)), metrics=metrics)
+    try:
+        doc_proc = DocProcessor(api_key_path, logger, cache=ocr_cache, batch_size=max(ocr_batch_size, 1),
+                                max_side=ocr_max_side, max_pixels=ocr_max_pixels,
+                                upload_quality=int(args.get('strOcrQuality', 85)),
+                                tile_threshold=int(args.get('strOcrTileThreshold', 0)) or None,
+                                tile_height=int(args.get('strOcrTileHeight', 2000)),
+                                tile_overlap=int(args.get('strOcrTileOverlap', 200)),
+                                metrics=metrics, backend=ocr_backend, flow=ocr_flow)
+    except Exception:
+        # 설정 오류/인증 실패 시 이미 띄운 백엔드(로컬 가짜 서버 등)를 정리
+        ocr_backend.close()
+        raise
+
+    # OCR 실행 방식: async(전역 동시성 제한 비동기) > batch(batch_annotate_images) > single(이미지별 순차)
+    ocr_mode = "single"
+    if ocr_concurrency > 0:
+        doc_proc.async_runner = AsyncDocProcessor(doc_proc, logger, concurrency=ocr_concurrency)
+        ocr_mode = "async"
+    elif ocr_batch_size > 1:
+        ocr_mode = "batch"
+    return {"doc_proc": doc_proc, "cache": ocr_cache, "flow": ocr_flow, "backend": ocr_backend, "ocr_mode": ocr_mode}
+
+def close_ocr_stack(ocr_stack):
+    doc_proc = ocr_stack['doc_proc']
+    if doc_proc.async_runner: doc_proc.async_runner.close()
+    ocr_stack['backend'].close()
+
 def parse_custom_rpa_string(input_str):
     if not input_str: return {}
     pattern = re.compile(r"\{([^,]+),([^}]*)\}")
@@ -189,7 +333,7 @@ def get_single_master_path_from_args(args, logger):
 
     return classified
 
-def run_rpa_process(args):
+def run_rpa_process(args, warm=None):
     try:
         if not args:
             return json.dumps({"status": "FAIL", "error": "입력 인자 없음"}, ensure_ascii=False)
@@ -210,14 +354,17 @@ def run_rpa_process(args):
         if not main_logger: 
             return json.dumps({"status": "FAIL", "error": "로그 폴더 생성 실패"}, ensure_ascii=False)
 
-        main_logger.info("=== RPA START ===")
+        run_id = new_run_id()
+        main_logger.info(f"=== RPA START (실행 ID: {run_id}) ===")
         main_logger.info(f"[입력값 확인] {args}")
 
         input_root = args.get('strInput')
         output_root = args.get('strOutput')
         api_key_path = args.get('strOcrKey')
 
-        if not all([input_root, output_root, api_key_path]):
+        # 실제 Vision 백엔드만 인증 키가 필요합니다.
+        needs_key = str(args.get('strOcrBackend', 'vision')).lower() == 'vision'
+        if not all([input_root, output_root]) or (needs_key and not api_key_path):
             return json.dumps({"status": "FAIL", "error": "필수 인자(Input/Output/Key) 누락"}, ensure_ascii=False)
 
         if not os.path.exists(input_root):
@@ -242,13 +389,52 @@ def run_rpa_process(args):
         elif master_paths.get('ftc'): active_t_name = "공정위"
         elif master_paths.get('except'): active_t_name = "예외어"
         
-        pre_proc = PreProcessor(main_logger)
-        doc_proc = DocProcessor(api_key_path, main_logger)
-        post_proc = PostProcessor(master_paths, main_logger)
-        img_handler = ImageHandler(main_logger)
+        from postprocessing import PostProcessor
+        from image_handler import ImageHandler
+
+        # 단계별 소요 시간/카운터 (실행 종료 시 로그 폴더에 metrics_<실행 ID>.json / .prom 기록)
+        run_metrics = RunMetrics()
+        pre_proc = PreProcessor(main_logger, metrics=run_metrics)
+        # 서비스 모드(warm)에서는 OCR 클라이언트/캐시와 컴파일된 마스터 사전을 호출 간에 재사용합니다.
+        if warm:
+            ocr_stack = warm.ocr_stack(args, api_key_path, input_root, output_root, log_base_path, main_logger, run_metrics)
+            post_proc = warm.post_processor(master_paths, log_base_path, main_logger, run_metrics,
+                                            line_cache_size=int(args.get('strLineCacheSize', 50000)))
+        else:
+            ocr_stack = build_ocr_stack(args, api_key_path, input_root, output_root, log_base_path, main_logger, run_metrics)
+            post_proc = PostProcessor(master_paths, main_logger, cache_dir=os.path.join(log_base_path, "_cache"),
+                                      metrics=run_metrics, line_cache_size=int(args.get('strLineCacheSize', 50000)))
+        doc_proc, ocr_cache, ocr_flow = ocr_stack['doc_proc'], ocr_stack['cache'], ocr_stack['flow']
+        ocr_mode = ocr_stack['ocr_mode']
+        img_handler = ImageHandler(main_logger, metrics=run_metrics)
         
+        # 유사 중복 이미지(공통 배너/안내 이미지) OCR 1회 공유 (strDedup=Y, 해밍 거리 기준 strDedupDistance)
+        dedup = None
+        if str(args.get('strDedup', 'N')).upper() == 'Y':
+            from image_dedup import NearDuplicateIndex
+            dedup = NearDuplicateIndex(main_logger, max_distance=int(args.get('strDedupDistance', 6)), metrics=run_metrics)
+        doc_proc.dedup = dedup
+
+        # 매칭/드로잉 프로세스 풀 (strPostWorkers, 0 = OCR 워커 스레드 안에서 실행)
+        post_workers = int(args.get('strPostWorkers', 0))
+        post_pool = None
+        if post_workers > 0:
+            from post_pool import PostProcessPool
+            post_pool = PostProcessPool(post_proc, main_logger, post_workers)
+
         modules = (pre_proc, doc_proc, post_proc, img_handler)
-        config = {"base_output_dir": output_root, "google_key_file": api_key_path, "active_t_name": active_t_name}
+        config = {"base_output_dir": output_root, "google_key_file": api_key_path, "active_t_name": active_t_name,
+                  "ocr_mode": ocr_mode,
+                  "in_memory_annotation": str(args.get('strInMemoryAnnotation', 'N')).upper() == 'Y',
+                  "post_pool": post_pool,
+                  "dedup": dedup,
+                  # 이전 실행 매니페스트 기준으로 변경 없는 상품 건너뛰기 (매니페스트 기록은 항상 수행)
+                  "resume": str(args.get('strResume', 'N')).upper() == 'Y',
+                  "manifest_settings": {"category": category, "review_type": review_type,
+                                        "active_t_name": active_t_name, "ocr": doc_proc.ocr_options},
+                  # 실행 전체 적발 내역을 상품 완료 시마다 덧붙이는 통합 CSV (로그 폴더, 실행별 파일)
+                  "findings": FindingsReport(current_log_dir, main_logger, run_id)}
+        manifest = RunManifest(output_root, main_logger)
 
         product_folders = []
         sub_dirs = [os.path.join(input_root, d) for d in os.listdir(input_root) if os.path.isdir(os.path.join(input_root, d))]
@@ -267,14 +453,40 @@ def run_rpa_process(args):
                 main_logger.warning(f"[설정] 처리할 폴더나 이미지 파일을 찾을 수 없습니다: {input_root}")
 
         results = []
-        with ThreadPoolExecutor(max_workers=3, thread_name_prefix="OCR_Worker") as executor:
-            futures = [executor.submit(process_single_product, p, category, review_type, config, modules, main_logger) for p in product_folders]
-            for f in futures: results.append(f.result())
-
+        if str(args.get('strPipeline', 'N')).upper() == 'Y':
+            # 단계별 생산자/소비자 파이프라인: 읽기/OCR/매칭·드로잉/병합·엑셀을 동시에 진행
+            from pipeline import PipelineRunner
+            stage_workers = [int(n) for n in str(args.get('strPipelineWorkers', '2,4,2,1')).split(',')]
+            # 프로세스 풀 모드에서는 post 단계 스레드가 결과를 기다리기만 하므로 풀 크기만큼 둡니다.
+            if post_pool: stage_workers[2] = max(stage_workers[2], post_pool.workers)
+            runner = PipelineRunner(modules, config, main_logger, setup_product_logger, export_product_results,
+                                    workers=dict(zip(PipelineRunner.STAGES, stage_workers)), manifest=manifest)
+            results = runner.run(product_folders, category, review_type)
+        else:
+            # 상품 단위 OCR(I/O) 워커 스레드 수 (strOcrWorkers) - 후처리 CPU 워커 수(strPostWorkers)와 별개
+            ocr_workers = max(1, int(args.get('strOcrWorkers', 3)))
+            with ThreadPoolExecutor(max_workers=ocr_workers, thread_name_prefix="OCR_Worker") as executor:
+                futures = [executor.submit(process_single_product, p, category, review_type, config, modules, main_logger, manifest)
+                           for p in product_folders]
+                for f in futures: results.append(f.result())
+
+        if not warm: close_ocr_stack(ocr_stack)
+        if post_pool: post_pool.close()
+        ocr_cache.log_stats(main_logger)
+        ocr_flow.log_stats(main_logger)
+        manifest.log_summary(main_logger)
+        config['findings'].log_summary(main_logger)
+        post_proc.line_cache.log_stats(main_logger)
+        if dedup: dedup.log_summary(main_logger)
+        run_metrics.write(current_log_dir, main_logger, run_id)
         success_cnt = sum(1 for r in results if r['status'] == 'SUCCESS')
-        main_logger.info(f"=== RPA END (성공:{success_cnt}) ===")
+        unchanged_cnt = sum(1 for r in results if r['status'] == 'UNCHANGED')
+        if unchanged_cnt:
+            main_logger.info(f"=== RPA END (성공:{success_cnt}, 변경 없음:{unchanged_cnt}) ===")
+        else:
+            main_logger.info(f"=== RPA END (성공:{success_cnt}) ===")
         
-        return json.dumps({"status": "SUCCESS", "log_path": current_log_dir}, ensure_ascii=False)
+        return json.dumps({"status": "SUCCESS", "log_path": current_log_dir, "run_id": run_id}, ensure_ascii=False)
         
     except Exception as e:
         err_msg = str(e)
@@ -0,0 +1,196 @@
+import io
+import sys
+import json
+import time
+import base64
+import random
+import logging
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from PIL import Image
+
+# 합성 응답에 사용하는 기본 단어 목록 (마스터 키워드와 일부 겹치도록 흔한 광고 문구 포함)
+DEFAULT_WORDS = ["최고", "품질", "무료", "배송", "안전", "인증", "특가", "정품", "국내산", "100%", "최상급", "효과"]
+
+
+class FakeVisionServer:
+    """
+    [Load Test] Vision REST API('POST /v1/images:annotate')를 흉내 내는 로컬 HTTP 서버입니다.
+    - latency_ms / jitter_ms: 요청당 응답 지연 (균등 분포 ±jitter)
+    - error_rate: 요청 단위 503 UNAVAILABLE 비율
+    - quota_qps: 초당 허용 요청 수 (초과 시 429 RESOURCE_EXHAUSTED, 0 이면 무제한)
+    - replay_index: 주어지면 저장된 '*_ocr.json' 결과를, 아니면 이미지 크기에 맞춘 합성 단어 격자를 돌려줍니다.
+    실행 중 통계(요청/이미지/오류/할당량 거부 수)는 stats 로 확인합니다.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency_ms=0, jitter_ms=0, error_rate=0.0, quota_qps=0,
+                 replay_index=None, words=None, seed=None, logger=None):
+        self.latency = latency_ms / 1000.0
+        self.jitter = jitter_ms / 1000.0
+        self.error_rate = error_rate
+        self.quota_qps = quota_qps
+        self.replay_index = replay_index
+        self.words = list(words or DEFAULT_WORDS)
+        self.logger = logger or logging.getLogger(__name__)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._window_start = 0.0
+        self._window_count = 0
+        self.stats = {"requests": 0, "images": 0, "errors": 0, "throttled": 0}
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                server._handle(self)
+
+            def log_message(self, fmt, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def endpoint(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="FakeVision", daemon=True)
+        self._thread.start()
+        self.logger.info(f"[가짜OCR서버] 시작: {self.endpoint} (지연 {self.latency*1000:.0f}±{self.jitter*1000:.0f}ms, "
+                         f"오류율 {self.error_rate:.1%}, 할당량 {self.quota_qps or '무제한'} QPS)")
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread: self._thread.join(timeout=5)
+        self.logger.info(f"[가짜OCR서버] 종료: 요청 {self.stats['requests']}건, 이미지 {self.stats['images']}장, "
+                         f"오류 {self.stats['errors']}건, 할당량 거부 {self.stats['throttled']}건")
+
+    # ---------------------------------------------------------
+    # 요청 처리
+    # ---------------------------------------------------------
+    def _admit(self):
+        """오류/할당량 판정: (HTTP 상태, 상태 문자열) 또는 None(정상)"""
+        with self._lock:
+            self.stats["requests"] += 1
+            now = time.monotonic()
+            if self.quota_qps:
+                if now - self._window_start >= 1.0:
+                    self._window_start, self._window_count = now, 0
+                if self._window_count >= self.quota_qps:
+                    self.stats["throttled"] += 1
+                    return 429, "RESOURCE_EXHAUSTED"
+                self._window_count += 1
+            if self.error_rate and self._rng.random() < self.error_rate:
+                self.stats["errors"] += 1
+                return 503, "UNAVAILABLE"
+            delay = max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+        time.sleep(delay)
+        return None
+
+    def _handle(self, handler):
+        length = int(handler.headers.get("Content-Length", 0))
+        body = handler.rfile.read(length)
+        if handler.path.split('?')[0] != "/v1/images:annotate":
+            return self._send(handler, 404, {"error": {"code": 404, "message": "not found", "status": "NOT_FOUND"}})
+
+        rejected = self._admit()
+        if rejected:
+            status, name = rejected
+            return self._send(handler, status, {"error": {"code": status, "message": f"fake server: {name}", "status": name}})
+
+        try:
+            requests = json.loads(body.decode('utf-8')).get("requests", [])
+        except Exception as e:
+            return self._send(handler, 400, {"error": {"code": 400, "message": str(e), "status": "INVALID_ARGUMENT"}})
+
+        responses = [self._annotate(base64.b64decode(r.get("image", {}).get("content", ""))) for r in requests]
+        with self._lock:
+            self.stats["images"] += len(requests)
+        self._send(handler, 200, {"responses": responses})
+
+    def _send(self, handler, status, payload):
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        try:
+            handler.send_response(status)
+            handler.send_header("Content-Type", "application/json; charset=utf-8")
+            handler.send_header("Content-Length", str(len(data)))
+            handler.end_headers()
+            handler.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            # 클라이언트가 타임아웃으로 먼저 연결을 끊은 경우
+            handler.close_connection = True
+
+    def _annotate(self, content):
+        """이미지 1장의 REST 형식 응답 (textAnnotations: 0번 전체 텍스트 + 단어 단위)"""
+        if self.replay_index is not None:
+            result = self.replay_index.lookup(content)
+            if result is None:
+                return {"error": {"code": 5, "message": "리플레이 대상 OCR 결과 없음"}}
+            words = result.words
+            items = [(words.descriptions[i], int(words.x0[i]), int(words.y0[i]), int(words.x1[i]), int(words.y1[i]))
+                     for i in range(len(words))]
+            full_text = result.full_text
+        else:
+            try:
+                with Image.open(io.BytesIO(content)) as img:
+                    width, height = img.size
+            except Exception as e:
+                return {"error": {"code": 3, "message": f"잘못된 이미지: {e}"}}
+            items = self._synthesize(content, width, height)
+            full_text = " ".join(item[0] for item in items)
+
+        annotations = [{"description": full_text}]
+        for description, x0, y0, x1, y1 in items:
+            annotations.append({"description": description, "boundingPoly": {"vertices": [
+                {"x": x0, "y": y0}, {"x": x1, "y": y0}, {"x": x1, "y": y1}, {"x": x0, "y": y1}]}})
+        return {"textAnnotations": annotations, "fullTextAnnotation": {"text": full_text}}
+
+    def _synthesize(self, content, width, height, line_height=40, word_width=60, gap=10):
+        """이미지 크기에 맞춘 단어 격자. 같은 이미지에는 항상 같은 결과를 돌려줍니다. (이미지 바이트 기반 시드)"""
+        rng = random.Random(len(content) * 31 + width * 7 + height)
+        items = []
+        for y in range(10, max(height - 30, 10), line_height):
+            for x in range(10, max(width - word_width, 10), word_width + gap):
+                items.append((rng.choice(self.words), x, y, x + word_width, y + 25))
+        return items
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Vision REST API 로컬 대역 서버 (부하 테스트용)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--jitter-ms", type=float, default=100)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--quota-qps", type=int, default=0)
+    parser.add_argument("--replay-output", help="리플레이할 '*_ocr.json' 이 있는 출력 폴더")
+    parser.add_argument("--replay-input", help="리플레이 색인용 원본 이미지 폴더")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    logger = logging.getLogger("fake_vision")
+    replay_index = None
+    if args.replay_output and args.replay_input:
+        from ocr_backends import ReplayIndex
+        replay_index = ReplayIndex(args.replay_output, args.replay_input, logger)
+
+    server = FakeVisionServer(args.host, args.port, args.latency_ms, args.jitter_ms, args.error_rate,
+                              args.quota_qps, replay_index=replay_index, logger=logger).start()
+    try:
+        while True: time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
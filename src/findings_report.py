@@ -0,0 +1,68 @@
+import os
+import csv
+import threading
+
+
+class FindingsReport:
+    """
+    [Step 4: Data Export] 실행(run) 전체의 적발 내역을 하나의 CSV('findings_<실행 ID>.csv')로 모읍니다.
+    - 상품 처리가 끝날 때마다 해당 상품의 적발 행을 바로 덧붙입니다. (스레드/파이프라인 워커 공용)
+    - 로그 폴더는 분 단위로 공유되므로 실행마다 별도 파일을 만들어 다른 실행(같은 분의 재실행, 서비스 작업)의 내역을 덮어쓰지 않습니다.
+    - 변경 없음으로 건너뛴 상품은 매니페스트에 남은 이전 적발 행을 '처리=변경 없음'으로 옮겨 적어, 이 파일만으로 전체 결과가 되도록 합니다.
+    - 엑셀에서 한글이 깨지지 않도록 utf-8-sig 로 기록합니다.
+    - 대시보드 등 후속 집계가 상품별 xlsx 를 하나씩 열지 않고 이 파일만 읽으면 되도록 하기 위한 것입니다.
+    """
+    FILE_PREFIX = "findings"
+    COLUMNS = ['상품코드', '카테고리', '심의타입', '검사유형', '페이지 번호', '적발 문구', '사전 단어', '처리']
+    TYPE_NAMES = {"ban": "금칙어", "ftc": "공정위", "except": "예외어"}
+    CHECKED = "검사"
+    UNCHANGED = "변경 없음"
+
+    def __init__(self, log_dir, logger, run_id):
+        self.path = os.path.join(log_dir, f"{self.FILE_PREFIX}_{run_id}.csv")
+        self.logger = logger
+        self._lock = threading.Lock()
+        self.rows = 0
+        self.products = 0
+        self.unchanged = 0
+        try:
+            # 'x': 같은 이름의 파일이 이미 있으면 덮어쓰지 않고 실패
+            with open(self.path, 'x', encoding='utf-8-sig', newline='') as f:
+                csv.writer(f).writerow(self.COLUMNS)
+        except Exception as e:
+            self.logger.warning(f"[통합리포트] 파일 생성 실패: {e}")
+            self.path = None
+
+    @classmethod
+    def make_rows(cls, product_code, category, review_type, issues):
+        """이슈 목록 -> CSV 행 목록 ('처리' 열 제외, 매니페스트에도 이 형태로 보관)"""
+        return [[product_code, category, review_type, cls.TYPE_NAMES.get(issue['type'], issue['type']),
+                 issue['data']['page'], issue['data']['matched_text'].strip(), issue['data']['dict_word']]
+                for issue in issues]
+
+    def append(self, product_code, category, review_type, issues):
+        rows = self.make_rows(product_code, category, review_type, issues)
+        self._write(product_code, [row + [self.CHECKED] for row in rows])
+
+    def append_unchanged(self, product_code, rows):
+        """변경 없음으로 건너뛴 상품의 이전 적발 행(make_rows 형태)을 옮겨 적습니다."""
+        self._write(product_code, [list(row) + [self.UNCHANGED] for row in rows], unchanged=True)
+
+    def _write(self, product_code, rows, unchanged=False):
+        if not self.path: return
+        with self._lock:
+            try:
+                # BOM 은 파일 맨 앞에 한 번만 있어야 하므로 덧붙이기는 utf-8 로 기록
+                with open(self.path, 'a', encoding='utf-8', newline='') as f:
+                    csv.writer(f).writerows(rows)
+                self.rows += len(rows)
+                self.products += 1
+                if unchanged: self.unchanged += 1
+            except Exception as e:
+                self.logger.warning(f"[통합리포트] 기록 실패 ({product_code}): {e}")
+
+    def log_summary(self, logger=None):
+        if not self.path: return
+        log = logger if logger else self.logger
+        log.info(f"[통합리포트] {os.path.basename(self.path)} 기록 완료: 상품 {self.products}개 "
+                 f"(변경 없음 {self.unchanged}개), 적발 {self.rows}건")
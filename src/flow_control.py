@@ -0,0 +1,260 @@
+import time
+import random
+import asyncio
+import threading
+from contextlib import contextmanager
+
+from google.api_core import exceptions as api_exceptions
+
+from metrics import NULL_METRICS
+
+# AnnotateImageResponse.error.code (google.rpc.Code) -> api_core 예외
+_RPC_CODE_ERRORS = {
+    4: api_exceptions.DeadlineExceeded,
+    8: api_exceptions.ResourceExhausted,
+    13: api_exceptions.InternalServerError,
+    14: api_exceptions.ServiceUnavailable,
+}
+
+# 재시도 대상: 할당량 초과(throttle)와 일시적 장애
+_THROTTLE_ERRORS = (api_exceptions.ResourceExhausted, api_exceptions.TooManyRequests)
+_TRANSIENT_ERRORS = (api_exceptions.ServiceUnavailable, api_exceptions.DeadlineExceeded,
+                     api_exceptions.InternalServerError, api_exceptions.BadGateway,
+                     ConnectionError, TimeoutError)
+
+
+def raise_for_response_error(response):
+    """응답 본문의 이미지 단위 오류를 예외로 바꿉니다. (재시도 분류가 가능하도록 api_core 예외 사용)"""
+    if not response.error.message:
+        return
+    error_cls = _RPC_CODE_ERRORS.get(response.error.code)
+    if error_cls:
+        raise error_cls(f"Google API 반환 에러: {response.error.message}")
+    raise Exception(f"Google API 반환 에러: {response.error.message}")
+
+
+def classify_error(error):
+    """'throttle' (할당량 초과) / 'transient' (일시 장애) / None (재시도 불가)"""
+    if isinstance(error, _THROTTLE_ERRORS):
+        return 'throttle'
+    if isinstance(error, _TRANSIENT_ERRORS):
+        return 'transient'
+    return None
+
+
+class TokenBucket:
+    """
+    모든 워커가 공유하는 초당 요청 수 제한기입니다. (rate: 초당 토큰, burst: 최대 누적 토큰)
+    reserve() 는 토큰 1개를 예약하고 기다려야 할 시간(초)을 돌려주므로 스레드/asyncio 양쪽에서 쓸 수 있습니다.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1.0
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD 방식으로 동시 요청 수 상한을 조절합니다.
+    - 성공: 상한 += 1/상한 (대략 왕복 1회당 +1)
+    - 할당량 초과: 상한 *= 0.5 (cooldown 초 안의 연속 거부는 한 번만 반영)
+    스레드용 slot() 과 asyncio 용 async_slot() 이 같은 상한/사용 중 개수를 공유합니다.
+    """
+
+    def __init__(self, initial, minimum=1, maximum=None, decrease=0.5, cooldown=1.0):
+        self.minimum = max(1, int(minimum))
+        self.maximum = max(self.minimum, int(maximum or initial))
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def _try_enter(self):
+        with self._cond:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    def _leave(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait(timeout=0.5)
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            self._leave()
+
+    async def _async_enter(self):
+        delay = 0.005
+        while not self._try_enter():
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.1)
+
+    class _AsyncSlot:
+        def __init__(self, owner):
+            self.owner = owner
+
+        async def __aenter__(self):
+            await self.owner._async_enter()
+
+        async def __aexit__(self, *exc):
+            self.owner._leave()
+
+    def async_slot(self):
+        return self._AsyncSlot(self)
+
+    def on_success(self):
+        with self._cond:
+            self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+    def on_throttle(self):
+        with self._cond:
+            now = time.monotonic()
+            if now - self._last_decrease < self.cooldown:
+                return False
+            self._last_decrease = now
+            self.limit = max(self.minimum, self.limit * self.decrease)
+            return True
+
+
+class FlowController:
+    """
+    [Step 2: Document Processing] Vision API 호출 흐름 제어기입니다. (모든 워커/비동기 태스크가 공유)
+    - TokenBucket: 초당 요청 수 상한 (qps, 0 이면 미사용)
+    - AdaptiveConcurrency: AIMD 동시 요청 수 상한 (RESOURCE_EXHAUSTED 시 절반, 성공 시 서서히 증가)
+    - 재시도: 할당량 초과/일시 장애(UNAVAILABLE, DEADLINE_EXCEEDED, INTERNAL)만 지터 포함 지수 백오프로 재시도하며,
+      최대 시도 횟수(max_attempts)와 이미지당 마감 시간(deadline 초)을 넘기면 마지막 오류를 그대로 올립니다.
+    - 지표: throttles, retries, retry_exhausted, rate_limited (RunMetrics 카운터)
+    """
+
+    def __init__(self, logger, qps=0, concurrency=8, min_concurrency=1, max_attempts=5,
+                 backoff_base=0.5, backoff_cap=20.0, deadline=120.0, metrics=None, seed=None):
+        self.logger = logger
+        self.metrics = metrics or NULL_METRICS
+        self.bucket = TokenBucket(qps) if qps else None
+        self.concurrency = AdaptiveConcurrency(concurrency, minimum=min_concurrency, maximum=concurrency)
+        self.max_attempts = max(1, int(max_attempts))
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.deadline = deadline
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"throttles": 0, "retries": 0, "retry_exhausted": 0, "rate_limited": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+        self.metrics.count(name)
+
+    def _rate_wait(self):
+        wait = self.bucket.reserve() if self.bucket else 0.0
+        if wait > 0:
+            self._count('rate_limited')
+        return wait
+
+    def _backoff(self, attempt, kind):
+        # 일시 장애: full jitter [0, ceiling] / 할당량 초과: equal jitter [ceiling/2, ceiling] (최소 대기 보장)
+        ceiling = min(self.backoff_cap, self.backoff_base * (2 ** attempt))
+        with self._lock:
+            if kind == 'throttle':
+                return ceiling / 2 + self._rng.uniform(0, ceiling / 2)
+            return self._rng.uniform(0, ceiling)
+
+    def _next_delay(self, error, attempt, started, label):
+        """재시도할 경우 대기 시간(초), 포기할 경우 None"""
+        kind = classify_error(error)
+        if kind is None:
+            return None
+        if kind == 'throttle':
+            self._count('throttles')
+            if self.concurrency.on_throttle():
+                self.logger.warning(f"[OCR흐름제어] 할당량 초과 -> 동시 요청 상한 {self.concurrency.limit:.1f} 로 축소")
+        delay = self._backoff(attempt, kind)
+        elapsed = time.monotonic() - started
+        if attempt + 1 >= self.max_attempts or elapsed + delay > self.deadline:
+            self._count('retry_exhausted')
+            self.logger.error(f"[OCR흐름제어] 재시도 한도 초과 ({label}, {attempt + 1}회, {elapsed:.1f}s): {error}")
+            return None
+        self._count('retries')
+        self.logger.warning(f"[OCR흐름제어] 재시도 {attempt + 1}/{self.max_attempts - 1} ({label}) "
+                            f"{delay:.2f}s 후: {error}")
+        return delay
+
+    def _timeout(self, started):
+        return max(1.0, self.deadline - (time.monotonic() - started))
+
+    def call(self, fn, label=""):
+        """
+        fn(timeout) 을 흐름 제어/재시도와 함께 실행합니다. (스레드용)
+        fn 은 남은 마감 시간(초)을 받아 API 를 호출하고, 실패 시 예외를 올려야 합니다.
+        """
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            wait = self._rate_wait()
+            if wait > 0: time.sleep(wait)
+            try:
+                with self.concurrency.slot():
+                    result = fn(self._timeout(started))
+                self.concurrency.on_success()
+                return result
+            except Exception as e:
+                delay = self._next_delay(e, attempt, started, label)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+
+    async def acall(self, coro_fn, label=""):
+        """call() 의 asyncio 버전. coro_fn(timeout) 은 코루틴을 반환합니다."""
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            wait = self._rate_wait()
+            if wait > 0: await asyncio.sleep(wait)
+            try:
+                async with self.concurrency.async_slot():
+                    result = await coro_fn(self._timeout(started))
+                self.concurrency.on_success()
+                return result
+            except Exception as e:
+                delay = self._next_delay(e, attempt, started, label)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    def reset_stats(self):
+        """재시도/할당량 초과 집계를 0 으로 되돌립니다. (서비스 모드에서 작업마다 호출, AIMD 동시 요청 수는 유지)"""
+        with self._lock:
+            for name in self.stats:
+                self.stats[name] = 0
+
+    def log_stats(self, logger=None):
+        log = logger if logger else self.logger
+        s = self.stats
+        log.info(f"[OCR흐름제어] 할당량 초과: {s['throttles']}건, 재시도: {s['retries']}건, "
+                 f"재시도 포기: {s['retry_exhausted']}건, 속도 제한 대기: {s['rate_limited']}건, "
+                 f"최종 동시 요청 상한: {self.concurrency.limit:.1f}")
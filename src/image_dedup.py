@@ -0,0 +1,202 @@
+import io
+import os
+import hashlib
+import threading
+from concurrent.futures import Future
+
+import numpy as np
+from PIL import Image
+
+from ocr_result import OcrResult
+from word_table import WordTable
+from metrics import NULL_METRICS
+
+
+def strong_diff_blocks(source_path, target_path, pixel_diff=64, block=8, max_pixels=2):
+    """
+    두 이미지를 원본 해상도로 비교해, 밝기 차이가 pixel_diff 를 넘는 픽셀이 block x block 칸 하나에
+    max_pixels 개보다 많이 모인 칸 수를 반환합니다. (0 이면 같은 이미지의 재인코딩/리사이즈로 판단)
+    크기가 다르면 큰 쪽을 작은 쪽 크기로 줄여(LANCZOS) 비교합니다. 재인코딩 잡음은 흩어져 있고,
+    추가/변경된 글자는 획이 한 칸에 모이므로 작은 글자 하나의 차이도 드러납니다.
+    """
+    with Image.open(source_path) as a, Image.open(target_path) as b:
+        size = min(a.size, b.size, key=lambda s: s[0] * s[1])
+        a = a.convert('L')
+        b = b.convert('L')
+        if a.size != size: a = a.resize(size, Image.LANCZOS)
+        if b.size != size: b = b.resize(size, Image.LANCZOS)
+        strong = np.abs(np.asarray(a, dtype=np.int16) - np.asarray(b, dtype=np.int16)) > pixel_diff
+    # 가장자리 자투리 줄/열도 한 칸이 되도록 block 배수로 채웁니다.
+    strong = np.pad(strong, ((0, -strong.shape[0] % block), (0, -strong.shape[1] % block)))
+    h, w = strong.shape
+    counts = strong.reshape(h // block, block, w // block, block).sum(axis=(1, 3))
+    return int((counts > max_pixels).sum())
+
+
+def dhash(path, hash_size=16):
+    """
+    차이 해시(dHash): 흑백 (hash_size+1) x hash_size 축소 이미지에서 가로로 이웃한 픽셀의 밝기 대소를 비트로 만듭니다.
+    재인코딩/약간의 리사이즈에는 거의 변하지 않습니다. 반환: (해시 정수, (너비, 높이))
+    path 는 파일 경로 또는 파일 객체입니다.
+    """
+    with Image.open(path) as img:
+        size = img.size
+        # JPEG 는 축소 디코딩(draft)으로 전체 픽셀을 풀지 않습니다.
+        img.draft('L', ((hash_size + 1) * 8, hash_size * 8))
+        small = np.asarray(img.convert('L').resize((hash_size + 1, hash_size), Image.BILINEAR), dtype=np.int16)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(''.join('1' if b else '0' for b in bits), 2), size
+
+
+class NearDuplicateIndex:
+    """
+    [Step 1 -> Step 2] 실행(run) 안의 유사 중복 이미지(공통 배송 안내/브랜드 배너/인증 이미지 등)를 묶어 OCR 을 한 번만 수행합니다.
+    - add(): PreProcessor 가 이미지마다 dHash 를 계산해 등록합니다.
+      해밍 거리 max_distance 이하이고 가로세로 비율 차이가 aspect_tolerance 이하인 이미지는 같은 그룹이 됩니다.
+      (해시를 max_distance+1 개 구간으로 나눠 색인하므로, 거리 조건을 만족하는 후보는 반드시 한 구간 이상이 일치합니다)
+    - claim()/publish()/follow(): 그룹에서 가장 먼저 OCR 을 요청한 이미지만 실제로 OCR 하고(single-flight),
+      나머지는 그 결과를 기다렸다가 자기 이미지 크기에 맞춰 좌표를 환산해 사용합니다.
+      대표 이미지의 OCR 이 실패하면 나머지는 각자 OCR 을 수행합니다.
+    dHash 는 축소 이미지라 글자 차이를 거의 보지 못합니다. (문구만 다른 배너도 거리 0~1)
+    그래서 재사용 전에 바이트 해시가 같거나, 원본 해상도 픽셀 비교(strong_diff_blocks)에서 차이 칸이 없는 경우에만 재사용하고
+    그 외에는 각자 OCR 을 수행합니다. 그룹 색인은 후보를 좁히는 용도입니다.
+    """
+
+    def __init__(self, logger, max_distance=6, aspect_tolerance=0.01, hash_size=16, metrics=None):
+        self.logger = logger
+        self.metrics = metrics or NULL_METRICS
+        self.max_distance = max(0, int(max_distance))
+        self.aspect_tolerance = aspect_tolerance
+        self.hash_size = hash_size
+        bits = hash_size * hash_size
+        bands = self.max_distance + 1
+        self._band_bits = [(i * bits // bands, (i + 1) * bits // bands) for i in range(bands)]
+        self._bands = {}    # (구간 번호, 구간 값) -> [그룹 번호, ...]
+        self._groups = []   # 그룹 번호 -> {"hash", "aspect", "members"}
+        self._images = {}   # 이미지 경로 -> (그룹 번호, (너비, 높이), 바이트 sha256)
+        self._flights = {}  # 그룹 번호 -> (Future, 대표 이미지 경로)
+        self._lock = threading.Lock()
+        self.reused = 0
+        self.rejected = 0
+
+    # ---------------------------------------------------------
+    # 등록 (Step 1: Pre-processing)
+    # ---------------------------------------------------------
+    def _band_keys(self, value):
+        return [(i, (value >> lo) & ((1 << (hi - lo)) - 1)) for i, (lo, hi) in enumerate(self._band_bits)]
+
+    def add(self, image_path):
+        """이미지의 dHash 를 계산해 유사 이미지 그룹에 등록합니다."""
+        try:
+            with open(image_path, 'rb') as f:
+                content = f.read()
+            value, size = dhash(io.BytesIO(content), self.hash_size)
+        except Exception as e:
+            self.logger.warning(f"[중복이미지] 해시 계산 실패 ({os.path.basename(image_path)}): {e}")
+            return
+        aspect = size[0] / float(size[1] or 1)
+        keys = self._band_keys(value)
+        with self._lock:
+            if image_path in self._images: return
+            best, best_distance = None, None
+            for gid in {g for key in keys for g in self._bands.get(key, ())}:
+                group = self._groups[gid]
+                if abs(group['aspect'] - aspect) > self.aspect_tolerance * group['aspect']:
+                    continue
+                distance = bin(group['hash'] ^ value).count('1')
+                if distance <= self.max_distance and (best is None or distance < best_distance):
+                    best, best_distance = gid, distance
+            if best is None:
+                best = len(self._groups)
+                self._groups.append({"hash": value, "aspect": aspect, "members": 0})
+                for key in keys:
+                    self._bands.setdefault(key, []).append(best)
+            self._groups[best]['members'] += 1
+            self._images[image_path] = (best, size, OcrResult.digest(content))
+
+    # ---------------------------------------------------------
+    # single-flight OCR (Step 2: Document Processing)
+    # ---------------------------------------------------------
+    def claim(self, image_path):
+        """그룹의 첫 요청이면 (True, Future) - 호출자가 OCR 후 publish() / 아니면 (False, Future) - follow() 로 대기"""
+        future = Future()
+        with self._lock:
+            entry = self._images.get(image_path)
+            if entry is None:
+                return True, future
+            gid = entry[0]
+            if gid in self._flights:
+                return False, self._flights[gid][0]
+            self._flights[gid] = (future, image_path)
+        return True, future
+
+    def publish(self, image_path, future, result=None, error=None):
+        if future.done(): return
+        if error is not None:
+            # 실패한 그룹은 다음 요청이 다시 대표가 되도록 비웁니다.
+            with self._lock:
+                gid = self._images.get(image_path, (None,))[0]
+                if self._flights.get(gid, (None,))[0] is future:
+                    del self._flights[gid]
+            future.set_exception(error)
+        else:
+            future.set_result((result, image_path))
+
+    def image_sha256(self, image_path):
+        """add() 에서 계산한 이미지 바이트 해시 (미등록이면 None)"""
+        with self._lock:
+            entry = self._images.get(image_path)
+        return entry[2] if entry else None
+
+    def follow(self, image_path, future):
+        """
+        대표 이미지의 OCR 결과를 이 이미지 크기로 환산해 돌려줍니다.
+        대표가 실패했거나, 픽셀 비교에서 내용이 다르다고 판단되면 None (호출자가 직접 OCR)
+        """
+        try:
+            result, source_path = future.result()
+        except Exception:
+            return None
+        with self._lock:
+            source = self._images.get(source_path, (None, None, None))
+            target = self._images.get(image_path, (None, None, None))
+        source_size, target_size = source[1], target[1]
+        if source[2] is None or source[2] != target[2]:
+            try:
+                blocks = strong_diff_blocks(source_path, image_path)
+            except Exception as e:
+                self.logger.warning(f"[중복이미지] 픽셀 비교 실패 ({os.path.basename(image_path)}): {e}")
+                blocks = None
+            if blocks != 0:
+                with self._lock:
+                    self.rejected += 1
+                self.metrics.count('dedup_rejected')
+                self.logger.info(f"[중복이미지] '{os.path.basename(image_path)}' 해시는 유사하나 픽셀 차이 있음 "
+                                 f"({blocks if blocks is not None else '-'}칸) -> 개별 OCR")
+                return None
+        with self._lock:
+            self.reused += 1
+        self.metrics.count('dedup_images')
+        source_name = f"{os.path.basename(os.path.dirname(source_path))}/{os.path.basename(source_path)}"
+        self.logger.info(f"[중복이미지] '{os.path.basename(image_path)}' -> '{source_name}' OCR 결과 재사용 (API 호출 생략)")
+        return self.rescale(result, source_size, target_size)
+
+    @staticmethod
+    def rescale(result, source_size, target_size):
+        """OcrResult 의 단어 좌표를 source_size -> target_size 비율로 환산합니다."""
+        if not result or not source_size or not target_size or tuple(source_size) == tuple(target_size):
+            return result
+        sx = target_size[0] / float(source_size[0])
+        sy = target_size[1] / float(source_size[1])
+        words = result.words
+        scale = lambda values, factor: np.rint(values * factor).astype(np.int64)
+        return OcrResult(result.full_text, WordTable(scale(words.x0, sx), scale(words.y0, sy), scale(words.x1, sx),
+                                                     scale(words.y1, sy), words.descriptions, words.norm_lens))
+
+    def log_summary(self, logger=None):
+        log = logger if logger else self.logger
+        with self._lock:
+            shared = sum(1 for g in self._groups if g['members'] > 1)
+            images = sum(g['members'] for g in self._groups if g['members'] > 1)
+        log.info(f"[중복이미지] 유사 이미지 그룹 {shared}개 (이미지 {images}장), OCR 재사용 {self.reused}장, "
+                 f"픽셀 차이로 제외 {self.rejected}장")
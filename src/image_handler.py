@@ -1,11 +1,49 @@
 import os
-from PIL import Image
+import io
+import time
+import struct
+import zlib
+import numpy as np
+from PIL import Image, ImageDraw
+
+from metrics import NULL_METRICS
+
+
+class AnnotatedImage:
+    """
+    원본 이미지 경로와 그 위에 그릴 박스 목록(draw command)입니다.
+    PostProcessor 가 temp 파일 대신 이 객체를 넘기면, ImageHandler 가 병합하면서 원본을 한 번만 디코딩해 박스를 그립니다.
+    """
+    __slots__ = ('path', 'boxes')
+
+    def __init__(self, path, boxes):
+        self.path = path
+        self.boxes = boxes  # [([x1, y1, x2, y2], 색상, 두께), ...]
+
+    def draw_on(self, img):
+        """이미지(원본 모드 그대로)에 박스를 그립니다."""
+        if not self.boxes: return img
+        draw = ImageDraw.Draw(img)
+        for rect, color, width in self.boxes:
+            draw.rectangle(rect, outline=color, width=width)
+        return img
 
 class ImageHandler:
-    def __init__(self, logger):
+    # 병합 캔버스가 이 픽셀 수를 넘으면 전체 캔버스 대신 띠(strip) 단위 스트리밍 PNG 인코더로 저장합니다.
+    STREAMING_THRESHOLD_PX = 40_000_000
+    STRIP_HEIGHT = 256
+
+    def __init__(self, logger, streaming_threshold_px=STREAMING_THRESHOLD_PX, metrics=None):
         self.logger = logger
+        self.metrics = metrics or NULL_METRICS
+        self.streaming_threshold_px = streaming_threshold_px
+
+    def merge_and_save(self, image_paths, output_path, product=None):
+        # 'merge' 지표는 용량 최적화('optimize')를 포함한 병합 저장 전체 시간입니다.
+        with self.metrics.timer('merge', product=product):
+            self._merge_and_save(image_paths, output_path, product)
 
-    def merge_and_save(self, image_paths, output_path):
+    def _merge_and_save(self, image_paths, output_path, product=None):
         if not image_paths:
             self.logger.warning("[이미지병합] 병합할 이미지가 없습니다.")
             return
@@ -13,57 +51,191 @@ class ImageHandler:
         try:
             self.logger.info(f"[이미지병합] 총 {len(image_paths)}장의 이미지를 병합합니다.")
             
-            images = []
+            # 항목은 파일 경로(temp 이미지) 또는 AnnotatedImage(원본 경로 + 박스 목록)입니다.
+            images, annotations = [], []
             for p in image_paths:
+                src_path = p.path if isinstance(p, AnnotatedImage) else p
                 try:
-                    images.append(Image.open(p))
+                    images.append(Image.open(src_path))
+                    annotations.append(p if isinstance(p, AnnotatedImage) else None)
                 except Exception as img_e:
-                    self.logger.error(f"[이미지병합] 이미지 열기 실패 ({p}): {img_e}")
+                    self.logger.error(f"[이미지병합] 이미지 열기 실패 ({src_path}): {img_e}")
 
             if not images:
                 return
 
             max_width = max(img.width for img in images)
             total_height = sum(img.height for img in images)
+
+            # 대용량 병합: 헤더만 읽은 상태에서 크기를 확인하고, 전체 캔버스 없이 띠 단위로 저장
+            if output_path.lower().endswith('.png') and max_width * total_height > self.streaming_threshold_px:
+                sources = [(img.filename, img.width, img.height, ann) for img, ann in zip(images, annotations)]
+                for img in images: img.close()
+                self._stream_merge_png(sources, max_width, total_height, output_path, product=product)
+                return
             
             merged_img = Image.new('RGB', (max_width, total_height), (255, 255, 255))
             y_offset = 0
-            for img in images:
+            for img, ann in zip(images, annotations):
+                if ann: ann.draw_on(img)
                 merged_img.paste(img, (0, y_offset))
                 y_offset += img.height
                 img.close()
             
-            self._save_optimized(merged_img, output_path)
+            self._save_optimized(merged_img, output_path, product=product)
 
         except Exception as e:
             self.logger.error(f"[이미지병합] 병합 중 치명적 오류: {e}")
 
-    def _save_optimized(self, image_obj, save_path, max_mb=30):
+    def _stream_merge_png(self, sources, max_width, total_height, save_path, max_mb=30, product=None):
+        """
+        원본 이미지를 한 장씩 디코딩 -> 띠(STRIP_HEIGHT 행) 단위로 PNG 스트림에 기록 -> 해제합니다.
+        - 레이아웃은 기존 캔버스 병합과 동일합니다. (왼쪽 정렬, 세로로 이어붙임, 남는 폭은 흰색)
+        - 최대 메모리: 원본 1장 + (가장 넓은 폭 x 띠 높이)
+        - 용량 제한(max_mb)을 넘으면 축소 배율을 추정해 다시 스트리밍합니다.
+        """
         target_size = max_mb * 1024 * 1024
-        quality = 95
-        resize_ratio = 0.9
-        
+        self.logger.info(f"[이미지병합] 스트리밍 병합 모드 ({max_width}x{total_height}, 띠 높이 {self.STRIP_HEIGHT}px)")
+
+        scale = 1.0
+        start_time = time.perf_counter()
+        while True:
+            self.metrics.count('encode_iterations')
+            current_size = self._write_png_stream(sources, max_width, total_height, save_path, scale)
+            self.logger.info(f"[결과저장] 스트리밍 저장 완료 (배율 {scale:.3f}). 크기: {current_size/1024/1024:.2f}MB")
+            if current_size <= target_size:
+                break
+            # 바이트 수는 픽셀 수(배율^2)에 대략 비례하므로 필요한 배율을 추정하고 10% 여유를 둡니다.
+            scale *= min(0.9, (target_size / current_size) ** 0.5 * 0.95)
+            self.logger.info(f"[용량최적화] 제한({max_mb}MB) 초과 -> 배율 {scale:.3f} 로 재저장")
+
+        self.metrics.observe('optimize', time.perf_counter() - start_time, product=product)
+        self.logger.info(f"[결과저장] 최종 저장 완료 ({current_size/1024/1024:.2f}MB): {os.path.basename(save_path)}")
+
+    def _write_png_stream(self, sources, max_width, total_height, save_path, scale):
+        out_width = max(1, int(max_width * scale))
+        heights = [max(1, int(h * scale)) if scale < 1.0 else h for _, _, h, _ in sources]
+        out_height = sum(heights)
+
+        def chunk(f, tag, data):
+            f.write(struct.pack(">I", len(data)))
+            f.write(tag)
+            f.write(data)
+            f.write(struct.pack(">I", zlib.crc32(tag + data) & 0xffffffff))
+
+        compressor = zlib.compressobj(6)
+        prev_row = np.zeros(out_width * 3, dtype=np.uint8)
+
+        with open(save_path, 'wb') as f:
+            f.write(b"\x89PNG\r\n\x1a\n")
+            chunk(f, b"IHDR", struct.pack(">IIBBBBB", out_width, out_height, 8, 2, 0, 0, 0))
+
+            for (path, w, h, ann), out_h in zip(sources, heights):
+                try:
+                    with Image.open(path) as src:
+                        if ann: ann.draw_on(src)
+                        # Image.paste 와 동일하게 RGB 로 변환 (알파 채널은 합성 없이 제거)
+                        rgb = src.convert('RGB')
+                    if scale < 1.0:
+                        rgb = rgb.resize((max(1, int(w * scale)), out_h), Image.Resampling.LANCZOS)
+                except Exception as img_e:
+                    self.logger.error(f"[이미지병합] 이미지 열기 실패 ({path}): {img_e}")
+                    rgb = Image.new('RGB', (max(1, int(w * scale)), out_h), (255, 255, 255))
+
+                src_w = min(rgb.width, out_width)
+                for top in range(0, out_h, self.STRIP_HEIGHT):
+                    bottom = min(top + self.STRIP_HEIGHT, out_h)
+                    strip = np.full((bottom - top, out_width * 3), 255, dtype=np.uint8)
+                    strip[:, :src_w * 3] = np.asarray(rgb.crop((0, top, src_w, bottom)), dtype=np.uint8).reshape(bottom - top, src_w * 3)
+
+                    # PNG 'Up' 필터: 바로 윗 행과의 차이를 기록 (uint8 overflow = mod 256)
+                    above = np.vstack([prev_row[None, :], strip[:-1]])
+                    filtered = np.empty((bottom - top, out_width * 3 + 1), dtype=np.uint8)
+                    filtered[:, 0] = 2
+                    filtered[:, 1:] = strip - above
+                    prev_row = strip[-1].copy()
+
+                    data = compressor.compress(filtered.tobytes())
+                    if data: chunk(f, b"IDAT", data)
+                rgb.close()
+
+            chunk(f, b"IDAT", compressor.flush())
+            chunk(f, b"IEND", b"")
+
+        return os.path.getsize(save_path)
+
+    def _save_optimized(self, image_obj, save_path, max_mb=30, product=None):
+        """
+        메모리 버퍼에 인코딩하며 용량 제한(max_mb) 이하가 되는 설정을 찾은 뒤, 디스크에는 한 번만 기록합니다.
+        - 저장 포맷은 확장자로 결정합니다. (PNG 는 quality 인자가 없으므로 해상도만 조절)
+        - JPEG: 품질(95 -> 최저 80)을 이진 탐색, 그래도 초과하면 해상도 배율을 이진 탐색합니다.
+        - 배율 탐색의 시작점은 1차 인코딩의 픽셀당 바이트 수로 추정합니다.
+        """
+        target_size = max_mb * 1024 * 1024
+        is_png = save_path.lower().endswith('.png')
+        min_quality, max_quality = 80, 95
+        encode_count = 0
+        start_time = time.perf_counter()
+
+        def encode(img, quality):
+            nonlocal encode_count
+            encode_count += 1
+            buf = io.BytesIO()
+            if is_png:
+                img.save(buf, format='PNG')
+            else:
+                img.convert('RGB').save(buf, format='JPEG', quality=quality, optimize=True)
+            return buf.getvalue()
+
         try:
-            image_obj.save(save_path, quality=quality)
-            current_size = os.path.getsize(save_path)
-            self.logger.info(f"[결과저장] 1차 저장 완료. 크기: {current_size/1024/1024:.2f}MB")
-
-            while current_size > target_size:
-                self.logger.info(f"[용량최적화] 제한({max_mb}MB) 초과 -> 압축 진행 중...")
-                
-                if quality > 80:
-                    quality -= 5
-                    image_obj.save(save_path, quality=quality, optimize=True)
+            data = encode(image_obj, max_quality)
+            quality = max_quality
+            self.logger.info(f"[결과저장] 1차 인코딩 완료. 크기: {len(data)/1024/1024:.2f}MB")
+
+            # 1) JPEG 품질 이진 탐색: 제한 이하가 되는 가장 높은 품질
+            if len(data) > target_size and not is_png:
+                self.logger.info(f"[용량최적화] 제한({max_mb}MB) 초과 -> 품질 탐색 중...")
+                lo, hi, best = min_quality, max_quality - 1, None
+                while lo <= hi:
+                    mid = (lo + hi) // 2
+                    candidate = encode(image_obj, mid)
+                    if len(candidate) <= target_size:
+                        best, lo = (mid, candidate), mid + 1
+                    else:
+                        hi = mid - 1
+                if best:
+                    quality, data = best
                 else:
-                    w, h = image_obj.size
-                    new_w, new_h = int(w * resize_ratio), int(h * resize_ratio)
-                    self.logger.info(f"[용량최적화]   -> 해상도 리사이징 ({w}x{h} -> {new_w}x{new_h})")
-                    image_obj = image_obj.resize((new_w, new_h), Image.Resampling.LANCZOS)
-                    image_obj.save(save_path, quality=quality, optimize=True)
-                
-                current_size = os.path.getsize(save_path)
-            
-            self.logger.info(f"[결과저장] 최종 저장 완료 ({current_size/1024/1024:.2f}MB): {os.path.basename(save_path)}")
-            
+                    quality, data = min_quality, encode(image_obj, min_quality)
+
+            # 2) 해상도 배율 이진 탐색: 제한 이하가 되는 가장 큰 배율
+            if len(data) > target_size:
+                w, h = image_obj.size
+                # 바이트 수는 픽셀 수(배율^2)에 대략 비례 -> 필요한 배율 추정
+                estimate = min(0.99, (target_size / len(data)) ** 0.5 * 0.97)
+                lo, hi, best = 0.0, 1.0, None
+                candidate_scale = estimate
+                for _ in range(12):
+                    new_w, new_h = max(1, int(w * candidate_scale)), max(1, int(h * candidate_scale))
+                    self.logger.info(f"[용량최적화]   -> 해상도 리사이징 시도 ({w}x{h} -> {new_w}x{new_h})")
+                    resized = image_obj.resize((new_w, new_h), Image.Resampling.LANCZOS)
+                    candidate = encode(resized, quality)
+                    if len(candidate) <= target_size:
+                        best, lo = candidate, candidate_scale
+                    else:
+                        hi = candidate_scale
+                    if best is not None and (hi - lo) / hi < 0.03:
+                        break
+                    candidate_scale = (lo + hi) / 2 if best is not None else candidate_scale * 0.8
+                if best is None:
+                    raise Exception("용량 제한을 만족하는 해상도를 찾지 못했습니다.")
+                data = best
+
+            with open(save_path, 'wb') as f:
+                f.write(data)
+            self.metrics.observe('optimize', time.perf_counter() - start_time, product=product)
+            self.metrics.count('encode_iterations', encode_count)
+            self.logger.info(f"[결과저장] 최종 저장 완료 ({len(data)/1024/1024:.2f}MB, 인코딩 {encode_count}회): {os.path.basename(save_path)}")
+
         except Exception as e:
-            self.logger.error(f"[결과저장] 저장/압축 중 에러: {e}")
\ No newline at end of file
+            self.logger.error(f"[결과저장] 저장/압축 중 에러: {e}")
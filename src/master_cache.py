@@ -0,0 +1,91 @@
+import os
+import glob
+import pickle
+import hashlib
+
+
+class MasterCache:
+    """
+    [Step 3: Post-processing] 마스터 사전(금칙어/공정위/예외어)에서 추출한 키워드 Set 과
+    컴파일된 매처를 디스크에 보관하는 캐시입니다.
+    - 키: 마스터 파일별 (절대경로, 크기, 수정시각, 내용 해시)
+    - 마스터 파일이 바뀌지 않았다면 엑셀 파싱/정규화/컴파일을 건너뛰고 바로 로드합니다.
+    """
+    # 캐시 포맷, 매처 구조, 키워드 추출 방식(_extract_keywords)이 바뀌면 올려서 기존 캐시를 무효화합니다.
+    # 2: pandas 없이 셀을 스트리밍하는 추출기로 변경 (예: 빈 칸이 섞인 열의 숫자 셀이 '1.0' 이 아닌 '1' 로 읽힘)
+    VERSION = 2
+
+    def __init__(self, cache_dir, logger, max_entries=20):
+        self.cache_dir = cache_dir
+        self.logger = logger
+        self.max_entries = max_entries
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def _file_fingerprint(path):
+        if not path or not os.path.exists(path):
+            return (path or "", None, None, None)
+        st = os.stat(path)
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                h.update(chunk)
+        return (os.path.abspath(path), st.st_size, st.st_mtime_ns, h.hexdigest())
+
+    @classmethod
+    def fingerprint(cls, master_paths):
+        """마스터 경로 dict 전체에 대한 지문(fingerprint)을 반환합니다."""
+        return tuple((key, cls._file_fingerprint(master_paths.get(key))) for key in ('ban', 'ftc', 'except'))
+
+    @classmethod
+    def content_digest(cls, fingerprint):
+        """
+        지문 중 내용 해시만으로 만든 요약값 (경로/수정시각이 달라도 내용이 같으면 동일, 실행 매니페스트용)
+        추출 방식이 바뀌면 결과도 달라지므로 VERSION 을 포함합니다.
+        """
+        contents = [(key, fp[3]) for key, fp in fingerprint]
+        return hashlib.sha256(repr((cls.VERSION, contents)).encode('utf-8')).hexdigest()
+
+    def _cache_path(self, fingerprint):
+        digest = hashlib.sha256(repr((self.VERSION, fingerprint)).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"master_{digest[:32]}.pkl")
+
+    def load(self, fingerprint):
+        """캐시 적중 시 (master_data, matcher) 를, 아니면 None 을 반환합니다."""
+        cache_path = self._cache_path(fingerprint)
+        if not os.path.exists(cache_path):
+            return None
+        try:
+            with open(cache_path, 'rb') as f:
+                payload = pickle.load(f)
+            if payload.get('version') != self.VERSION or payload.get('fingerprint') != fingerprint:
+                return None
+            os.utime(cache_path)
+            self.logger.info(f"[마스터캐시] 캐시 적중: {os.path.basename(cache_path)}")
+            return payload['master_data'], payload['matcher']
+        except Exception as e:
+            self.logger.warning(f"[마스터캐시] 캐시 로드 실패 (재생성합니다): {e}")
+            return None
+
+    def save(self, fingerprint, master_data, matcher):
+        cache_path = self._cache_path(fingerprint)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        try:
+            payload = {"version": self.VERSION, "fingerprint": fingerprint,
+                       "master_data": master_data, "matcher": matcher}
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+            self.logger.info(f"[마스터캐시] 캐시 저장 완료: {os.path.basename(cache_path)}")
+            self._prune()
+        except Exception as e:
+            self.logger.warning(f"[마스터캐시] 캐시 저장 실패: {e}")
+            if os.path.exists(tmp_path):
+                try: os.remove(tmp_path)
+                except: pass
+
+    def _prune(self):
+        entries = sorted(glob.glob(os.path.join(self.cache_dir, "master_*.pkl")), key=os.path.getmtime, reverse=True)
+        for old in entries[self.max_entries:]:
+            try: os.remove(old)
+            except: pass
@@ -0,0 +1,62 @@
+import threading
+from collections import OrderedDict
+
+
+class LineMatchCache:
+    """
+    [Step 3: Post-processing] 줄 텍스트 -> 매칭 결과 메모리 캐시입니다. (모든 워커 스레드가 공유, 크기 제한 LRU)
+    - 키: 정규화(NFC)된 줄 텍스트 / 값: (유형, 사전 단어, 매칭 구간) 튜플 목록
+    - 반품/교환 안내, 원산지 표기, 주의사항처럼 여러 이미지/상품에 반복되는 줄은 매칭을 다시 하지 않습니다.
+    - 영역(bbox) 계산은 이미지마다 단어 좌표가 다르므로 캐시된 구간으로 매번 수행합니다.
+    """
+
+    def __init__(self, max_entries=50000):
+        self.max_entries = max(0, int(max_entries))
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, text):
+        with self._lock:
+            matches = self._entries.get(text)
+            if matches is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(text)
+            self.hits += 1
+            return matches
+
+    def put(self, text, matches):
+        if not self.max_entries: return
+        with self._lock:
+            self._entries[text] = matches
+            self._entries.move_to_end(text)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evicted += 1
+
+    def add_stats(self, hits, misses):
+        """다른 프로세스(후처리 풀 워커)의 적중/미적중 수를 합칩니다."""
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def resize(self, max_entries):
+        """최대 보관 줄 수를 바꿉니다. 줄어들면 오래 사용되지 않은 줄부터 삭제합니다."""
+        with self._lock:
+            self.max_entries = max(0, int(max_entries))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def reset_stats(self):
+        """적중/삭제 집계를 0 으로 되돌립니다. (서비스 모드에서 작업마다 호출, 캐시 내용은 유지)"""
+        with self._lock:
+            self.hits = self.misses = self.evicted = 0
+
+    def log_stats(self, logger):
+        total = self.hits + self.misses
+        rate = (self.hits / total * 100) if total else 0.0
+        logger.info(f"[줄매칭캐시] 적중: {self.hits}건, 미적중: {self.misses}건 (적중률 {rate:.1f}%), "
+                    f"삭제(LRU): {self.evicted}건, 보관: {len(self._entries)}/{self.max_entries}줄")
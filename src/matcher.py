@@ -0,0 +1,170 @@
+import re
+
+
+class KeywordMatch:
+    """
+    re.Match 와 호환되는 최소 인터페이스(start/end/span/group)를 제공하는 매칭 결과 객체입니다.
+    """
+    __slots__ = ('string', '_start', '_end')
+
+    def __init__(self, string, start, end):
+        self.string = string
+        self._start = start
+        self._end = end
+
+    def start(self):
+        return self._start
+
+    def end(self):
+        return self._end
+
+    def span(self):
+        return self._start, self._end
+
+    def group(self):
+        return self.string[self._start:self._end]
+
+    def __repr__(self):
+        return f"<KeywordMatch span=({self._start}, {self._end}) match={self.group()!r}>"
+
+
+class KeywordMatcher:
+    """
+    [Step 3: Post-processing] 예외어/금칙어/공정위 키워드 전체를 하나의 Aho-Corasick 오토마톤으로 묶어
+    한 줄을 단 한 번만 스캔하는 다중 키워드 매처입니다.
+
+    - 줄 텍스트에서 공백/특수문자를 제거한 '뼈대(skeleton)' 문자열과 원본 오프셋 맵을 만들고,
+      뼈대 위에서 모든 키워드를 동시에 찾은 뒤 원본 좌표로 되돌립니다.
+    - 기존 정규식(글자 사이 [\\s\\W]* 허용, IGNORECASE, 앞뒤 한글 경계)과 동일한 결과를 냅니다.
+    - 특수문자가 포함된 키워드(예: 'A+B')는 뼈대로 표현할 수 없으므로 기존 정규식으로 처리합니다.
+    """
+    CATEGORIES = ('except', 'ban', 'ftc')
+
+    _WORD_RE = re.compile(r'\w')
+    _WORD_ONLY_RE = re.compile(r'\w+')
+
+    def __init__(self, keyword_sets):
+        # 카테고리별 우선순위: 기존과 동일하게 긴 키워드 우선
+        self.ranked = {}
+        for cat in self.CATEGORIES:
+            keywords = keyword_sets.get(cat) or set()
+            self.ranked[cat] = sorted(keywords, key=len, reverse=True)
+
+        # 오토마톤 노드 (리스트 기반)
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]       # 노드에서 끝나는 패턴 id 목록
+        self._dict_link = [0]  # 출력이 있는 가장 가까운 suffix 노드 (0 = 없음)
+
+        self._pattern_len = []     # 패턴 id -> 뼈대 길이
+        self._pattern_entries = [] # 패턴 id -> [(카테고리, 순위, 키워드), ...]
+        self._fallback = []        # [(카테고리, 순위, 키워드, 정규식)]
+
+        pattern_ids = {}
+        for cat in self.CATEGORIES:
+            for rank, k in enumerate(self.ranked[cat]):
+                clean_k = re.sub(r'\s+', '', k)
+                if not clean_k:
+                    continue
+                if not self._WORD_ONLY_RE.fullmatch(clean_k):
+                    fuzzy_k = r"[\s\W]*".join(re.escape(c) for c in clean_k)
+                    pattern = re.compile(rf"(?<![가-힣]){fuzzy_k}(?![가-힣])", re.IGNORECASE)
+                    self._fallback.append((cat, rank, k, pattern))
+                    continue
+
+                skel = self._fold(clean_k)
+                pid = pattern_ids.get(skel)
+                if pid is None:
+                    pid = self._add_pattern(skel)
+                    pattern_ids[skel] = pid
+                self._pattern_entries[pid].append((cat, rank, k))
+
+        self._build_links()
+
+    @staticmethod
+    def _fold(text):
+        # IGNORECASE 대응: 글자 수가 바뀌지 않는 범위에서 소문자화
+        return "".join(c.lower() if len(c.lower()) == 1 else c for c in text)
+
+    def _add_pattern(self, skel):
+        node = 0
+        for c in skel:
+            nxt = self._goto[node].get(c)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._dict_link.append(0)
+                self._goto[node][c] = nxt
+            node = nxt
+        pid = len(self._pattern_len)
+        self._pattern_len.append(len(skel))
+        self._pattern_entries.append([])
+        self._out[node].append(pid)
+        return pid
+
+    def _build_links(self):
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for c, child in self._goto[node].items():
+                f = self._fail[node]
+                while f and c not in self._goto[f]:
+                    f = self._fail[f]
+                target = self._goto[f].get(c, 0)
+                self._fail[child] = target if target != child else 0
+                fc = self._fail[child]
+                self._dict_link[child] = fc if self._out[fc] else self._dict_link[fc]
+                queue.append(child)
+
+    def skeleton(self, text):
+        """공백/특수문자를 제거한 뼈대 문자열과 뼈대 인덱스 -> 원본 인덱스 맵을 반환합니다."""
+        positions = [m.start() for m in self._WORD_RE.finditer(text)]
+        skel = self._fold("".join(text[i] for i in positions))
+        return skel, positions
+
+    def scan(self, text):
+        """
+        한 줄을 한 번 스캔하여 카테고리별 후보 매칭을 반환합니다.
+        반환값: {카테고리: [(키워드, KeywordMatch), ...]} (키워드 우선순위 -> 등장 위치 순)
+        각 키워드의 매칭은 기존 finditer 와 동일하게 서로 겹치지 않습니다.
+        """
+        skel, positions = self.skeleton(text)
+        n_text = len(text)
+
+        # (카테고리, 순위) -> [(원본 시작, 원본 끝)]
+        hits = {}
+        goto, fail, out, dict_link = self._goto, self._fail, self._out, self._dict_link
+        node = 0
+        for i, c in enumerate(skel):
+            while node and c not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(c, 0)
+            o = node if out[node] else dict_link[node]
+            while o:
+                for pid in out[o]:
+                    s = positions[i - self._pattern_len[pid] + 1]
+                    e = positions[i] + 1
+                    # 한국어 단어 경계: 원본 텍스트 기준 앞뒤에 한글이 붙어있지 않아야 함
+                    if s > 0 and '가' <= text[s - 1] <= '힣': continue
+                    if e < n_text and '가' <= text[e] <= '힣': continue
+                    for cat, rank, _ in self._pattern_entries[pid]:
+                        hits.setdefault((cat, rank), []).append((s, e))
+                o = dict_link[o]
+
+        for cat, rank, k, pat in self._fallback:
+            for m in pat.finditer(text):
+                hits.setdefault((cat, rank), []).append((m.start(), m.end()))
+
+        result = {cat: [] for cat in self.CATEGORIES}
+        for (cat, rank) in sorted(hits, key=lambda key: (self.CATEGORIES.index(key[0]), key[1])):
+            keyword = self.ranked[cat][rank]
+            last_end = -1
+            for s, e in sorted(hits[(cat, rank)]):
+                if s < last_end: continue
+                result[cat].append((keyword, KeywordMatch(text, s, e)))
+                last_end = e
+        return result
@@ -0,0 +1,132 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+
+def _percentile(sorted_values, q):
+    """정렬된 값 목록의 백분위수 (nearest-rank)"""
+    if not sorted_values: return 0.0
+    rank = max(1, int(round(q * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class RunMetrics:
+    """
+    [Main Processor] 실행(run) 단위 단계별 소요 시간/처리량 지표 수집기입니다.
+    - 단계(stage) 소요 시간: 이미지/상품 단위로 기록 (scan, ocr, match, draw, merge, optimize, excel, product ...)
+    - 카운터: 업로드 바이트, 단어/줄/매칭 수, 인코딩 반복 횟수 등
+    - 실행 종료 시 로그 폴더에 metrics_<실행 ID>.json / .prom (Prometheus 텍스트 형식, p50/p95 포함)을 남깁니다.
+      (로그 폴더는 분 단위로 공유되므로 실행마다 별도 파일)
+    """
+    QUANTILES = (0.5, 0.95)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started = time.time()
+        self._durations = {}   # stage -> [seconds, ...]
+        self._by_product = {}  # product -> {stage: seconds 합계}
+        self._counters = {}    # name -> value
+        self._samples = []     # [(stage, product, image, seconds), ...]
+
+    def observe(self, stage, seconds, product=None, image=None):
+        with self._lock:
+            self._durations.setdefault(stage, []).append(seconds)
+            if product:
+                stages = self._by_product.setdefault(product, {})
+                stages[stage] = stages.get(stage, 0.0) + seconds
+            self._samples.append((stage, product, image, seconds))
+
+    @contextmanager
+    def timer(self, stage, product=None, image=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, product=product, image=image)
+
+    def count(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def raw(self):
+        """다른 프로세스로 옮길 수 있는 원시 기록 (샘플 목록, 카운터)"""
+        with self._lock:
+            return list(self._samples), dict(self._counters)
+
+    def merge(self, raw):
+        """raw() 결과(프로세스 풀 워커의 기록)를 이 수집기에 합칩니다."""
+        samples, counters = raw
+        for stage, product, image, seconds in samples:
+            self.observe(stage, seconds, product=product, image=image)
+        for name, value in counters.items():
+            self.count(name, value)
+
+    def summary(self):
+        with self._lock:
+            stages = {}
+            for stage, values in self._durations.items():
+                ordered = sorted(values)
+                stages[stage] = {
+                    "count": len(ordered),
+                    "sum": round(sum(ordered), 6),
+                    "p50": round(_percentile(ordered, 0.5), 6),
+                    "p95": round(_percentile(ordered, 0.95), 6),
+                    "max": round(ordered[-1], 6),
+                }
+            return {
+                "wall_seconds": round(time.time() - self._started, 3),
+                "stages": stages,
+                "counters": dict(self._counters),
+                "products": {p: {s: round(v, 6) for s, v in st.items()} for p, st in self._by_product.items()},
+                "samples": [{"stage": s, "product": p, "image": i, "seconds": round(sec, 6)} for s, p, i, sec in self._samples],
+            }
+
+    def to_prometheus(self, summary=None):
+        summary = summary or self.summary()
+        lines = ["# HELP ns_ocr_stage_seconds Stage duration per image/product in seconds",
+                 "# TYPE ns_ocr_stage_seconds summary"]
+        for stage, st in sorted(summary["stages"].items()):
+            lines.append(f'ns_ocr_stage_seconds{{stage="{stage}",quantile="0.5"}} {st["p50"]}')
+            lines.append(f'ns_ocr_stage_seconds{{stage="{stage}",quantile="0.95"}} {st["p95"]}')
+            lines.append(f'ns_ocr_stage_seconds_sum{{stage="{stage}"}} {st["sum"]}')
+            lines.append(f'ns_ocr_stage_seconds_count{{stage="{stage}"}} {st["count"]}')
+        for name, value in sorted(summary["counters"].items()):
+            lines.append(f"# TYPE ns_ocr_{name}_total counter")
+            lines.append(f"ns_ocr_{name}_total {value}")
+        lines.append("# TYPE ns_ocr_run_wall_seconds gauge")
+        lines.append(f"ns_ocr_run_wall_seconds {summary['wall_seconds']}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, log_dir, logger=None, run_id=None):
+        """로그 폴더에 metrics_<run_id>.json / metrics_<run_id>.prom 을 기록합니다. (run_id 가 없으면 metrics.json / .prom)"""
+        try:
+            summary = self.summary()
+            stem = os.path.join(log_dir, f"metrics_{run_id}" if run_id else "metrics")
+            with open(f"{stem}.json", "w", encoding="utf-8") as f:
+                json.dump(summary, f, ensure_ascii=False, separators=(',', ':'))
+            with open(f"{stem}.prom", "w", encoding="utf-8") as f:
+                f.write(self.to_prometheus(summary))
+            if logger:
+                parts = [f"{s}: p50 {st['p50']:.3f}s / p95 {st['p95']:.3f}s (n={st['count']})" for s, st in sorted(summary["stages"].items())]
+                logger.info("[지표] " + ", ".join(parts))
+        except Exception as e:
+            if logger: logger.warning(f"[지표] 지표 파일 저장 실패: {e}")
+
+
+class _NullMetrics:
+    """지표 수집을 사용하지 않을 때의 기본값 (모든 호출을 무시)"""
+
+    def observe(self, stage, seconds, product=None, image=None): pass
+
+    @contextmanager
+    def timer(self, stage, product=None, image=None):
+        yield
+
+    def count(self, name, value=1): pass
+
+    def merge(self, raw): pass
+
+
+NULL_METRICS = _NullMetrics()
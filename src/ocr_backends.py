@@ -0,0 +1,248 @@
+import os
+import io
+import json
+import hashlib
+import asyncio
+import threading
+import http.client
+from urllib.parse import urlsplit
+
+from google.cloud import vision
+from google.api_core import exceptions as api_exceptions
+
+from ocr_result import OcrResult
+
+_IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+_SIDECAR_SUFFIX = "_ocr.json"
+
+
+def response_from_result(result):
+    """OcrResult 를 AnnotateImageResponse(text_annotations) 로 되돌립니다. (0번 전체 텍스트 + 단어 단위)"""
+    words = result.words
+    annotations = [vision.EntityAnnotation(description=result.full_text)]
+    for i, description in enumerate(words.descriptions):
+        x0, y0, x1, y1 = int(words.x0[i]), int(words.y0[i]), int(words.x1[i]), int(words.y1[i])
+        vertices = [vision.Vertex(x=x0, y=y0), vision.Vertex(x=x1, y=y0), vision.Vertex(x=x1, y=y1), vision.Vertex(x=x0, y=y1)]
+        annotations.append(vision.EntityAnnotation(description=description, bounding_poly=vision.BoundingPoly(vertices=vertices)))
+    return vision.AnnotateImageResponse(text_annotations=annotations,
+                                        full_text_annotation=vision.TextAnnotation(text=result.full_text))
+
+
+class ReplayIndex:
+    """
+    이전 실행이 남긴 '*_ocr.json' 사이드카를 이미지 바이트 해시로 찾아주는 색인입니다.
+    - sidecar_root: 사이드카가 있는 출력 폴더 (상품 폴더별 '<이미지 파일명>_ocr.json')
+    - image_root: 원본 이미지 폴더. 같은 이름(상품 폴더 + 파일명)의 사이드카와 짝지어 sha256(이미지 바이트) -> 사이드카 경로를 만듭니다.
+    """
+
+    def __init__(self, sidecar_root, image_root, logger=None):
+        self.logger = logger
+        sidecars = {}
+        for folder, _, files in os.walk(sidecar_root):
+            for name in files:
+                if name.endswith(_SIDECAR_SUFFIX):
+                    image_name = name[:-len(_SIDECAR_SUFFIX)]
+                    sidecars.setdefault(image_name, {})[os.path.basename(folder)] = os.path.join(folder, name)
+
+        self._by_hash = {}
+        for folder, _, files in os.walk(image_root):
+            for name in files:
+                if not name.lower().endswith(_IMAGE_EXTENSIONS) or name not in sidecars:
+                    continue
+                # 같은 파일명이 여러 상품에 있으면 상품 폴더명이 같은 사이드카를 우선합니다.
+                candidates = sidecars[name]
+                path = candidates.get(os.path.basename(folder)) or next(iter(candidates.values()))
+                with io.open(os.path.join(folder, name), 'rb') as f:
+                    self._by_hash[hashlib.sha256(f.read()).hexdigest()] = path
+        if logger:
+            logger.info(f"[OCR리플레이] 사이드카 색인 완료: {len(self._by_hash)}건 ({sidecar_root})")
+
+    def __len__(self):
+        return len(self._by_hash)
+
+    def lookup(self, content):
+        """이미지 바이트에 해당하는 OcrResult (없으면 None). 사이드카에 기록된 이미지 해시가 다르면(이미지 교체) None"""
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._by_hash.get(digest)
+        if not path: return None
+        with io.open(path, 'rb') as f:
+            data = json.loads(f.read().decode('utf-8'))
+        if data.get("image_sha256", digest) != digest:
+            return None
+        return OcrResult.from_dict(data)
+
+
+class ReplayClient:
+    """
+    저장된 '*_ocr.json' 을 돌려주는 ImageAnnotatorClient 대역입니다. (네트워크/인증 불필요)
+    - 업로드 축소를 켜면 업로드 바이트가 원본과 달라져 색인과 맞지 않으므로, 리플레이 시에는 원본 전송을 사용해야 합니다.
+    """
+
+    def __init__(self, index):
+        self.index = index
+
+    def _annotate(self, content):
+        result = self.index.lookup(content)
+        if result is None:
+            return vision.AnnotateImageResponse(error={"code": 5, "message": "리플레이 대상 OCR 결과 없음"})
+        return response_from_result(result)
+
+    def document_text_detection(self, image, **kwargs):
+        return self._annotate(image.content)
+
+    def batch_annotate_images(self, requests, **kwargs):
+        return vision.BatchAnnotateImagesResponse(responses=[self._annotate(r.image.content) for r in requests])
+
+
+class HttpVisionClient:
+    """
+    Vision REST 엔드포인트('POST /v1/images:annotate')와 통신하는 ImageAnnotatorClient 대역입니다.
+    - 로컬 가짜 서버(FakeVisionServer) 등 호환 서버에 연결하여 부하 테스트에 사용합니다.
+    - 스레드별로 keep-alive 연결을 재사용합니다.
+    - HTTP 오류는 실제 클라이언트와 같은 google.api_core 예외(ResourceExhausted, ServiceUnavailable ...)로 변환합니다.
+    - 호출별 timeout(초, 흐름 제어의 남은 마감 시간)을 소켓 타임아웃으로 적용하고, 초과 시 DeadlineExceeded 를 발생시킵니다.
+    """
+    _STATUS_ERRORS = {429: api_exceptions.ResourceExhausted, 503: api_exceptions.ServiceUnavailable,
+                      504: api_exceptions.DeadlineExceeded}
+
+    def __init__(self, endpoint, timeout=60):
+        parts = urlsplit(endpoint if "://" in endpoint else f"http://{endpoint}")
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.path = (parts.path.rstrip('/') or "") + "/v1/images:annotate"
+        self.timeout = timeout
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _post(self, body, timeout=None):
+        conn = self._connection()
+        timeout = self.timeout if timeout is None else timeout
+        # 연결을 재사용하므로 요청마다 타임아웃을 다시 지정 (이미 연결된 소켓에도 적용)
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        try:
+            conn.request("POST", self.path, body=body, headers={"Content-Type": "application/json"})
+            response = conn.getresponse()
+            data = response.read()
+        except Exception as e:
+            # 끊긴 keep-alive 연결은 버리고 다음 요청에서 새로 연결 (응답을 기다리다 끊은 연결도 재사용 불가)
+            conn.close()
+            self._local.conn = None
+            if isinstance(e, TimeoutError):
+                raise api_exceptions.DeadlineExceeded(f"요청 시간 초과 ({timeout}s)") from e
+            raise
+        if response.status != 200:
+            try:
+                message = json.loads(data.decode('utf-8')).get("error", {}).get("message", "")
+            except Exception:
+                message = data[:200].decode('utf-8', 'replace')
+            error_cls = self._STATUS_ERRORS.get(response.status)
+            if error_cls:
+                raise error_cls(message)
+            raise api_exceptions.from_http_status(response.status, message)
+        return data
+
+    def batch_annotate_images(self, requests, timeout=None, **kwargs):
+        request = vision.BatchAnnotateImagesRequest(requests=requests)
+        body = vision.BatchAnnotateImagesRequest.to_json(request, use_integers_for_enums=False, indent=None)
+        data = self._post(body.encode('utf-8'), timeout)
+        return vision.BatchAnnotateImagesResponse.from_json(data.decode('utf-8'), ignore_unknown_fields=True)
+
+    def document_text_detection(self, image, timeout=None, **kwargs):
+        feature = vision.Feature(type_=vision.Feature.Type.DOCUMENT_TEXT_DETECTION)
+        request = vision.AnnotateImageRequest(image=image, features=[feature])
+        return self.batch_annotate_images(requests=[request], timeout=timeout).responses[0]
+
+    def close(self):
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+
+
+class AsyncClientAdapter:
+    """동기 클라이언트 대역을 AsyncDocProcessor 가 쓰는 비동기 인터페이스(await batch_annotate_images)로 감쌉니다."""
+
+    def __init__(self, client):
+        self._client = client
+
+    async def batch_annotate_images(self, requests, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, lambda: self._client.batch_annotate_images(requests=requests, **kwargs))
+
+
+class VisionBackend:
+    """실제 Google Vision API (서비스 계정 키 파일 인증)"""
+    name = "vision"
+
+    def __init__(self, key_path, logger):
+        self.key_path = key_path
+        self.logger = logger
+
+    def create_client(self):
+        os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = self.key_path
+        client = vision.ImageAnnotatorClient()
+        self.logger.info("[OCR] Google Vision API 클라이언트 인증 성공")
+        return client
+
+    def create_async_client(self):
+        return vision.ImageAnnotatorAsyncClient()
+
+    def close(self):
+        pass
+
+
+class ReplayBackend:
+    """저장된 '*_ocr.json' 사이드카 재생 (오프라인 재현/회귀 확인용)"""
+    name = "replay"
+
+    def __init__(self, sidecar_root, image_root, logger):
+        self.logger = logger
+        self.index = ReplayIndex(sidecar_root, image_root, logger)
+
+    def create_client(self):
+        return ReplayClient(self.index)
+
+    def create_async_client(self):
+        return AsyncClientAdapter(ReplayClient(self.index))
+
+    def close(self):
+        pass
+
+
+class HttpBackend:
+    """Vision REST 호환 엔드포인트 (로컬 가짜 서버 등). server 가 주어지면 종료 시 함께 정지합니다."""
+    name = "http"
+
+    def __init__(self, endpoint, logger, timeout=60, server=None):
+        self.endpoint = endpoint
+        self.logger = logger
+        self.timeout = timeout
+        self.server = server
+        self._clients = []
+
+    def create_client(self):
+        client = HttpVisionClient(self.endpoint, timeout=self.timeout)
+        self._clients.append(client)
+        self.logger.info(f"[OCR] HTTP OCR 엔드포인트 사용: {self.endpoint}")
+        return client
+
+    def create_async_client(self):
+        return AsyncClientAdapter(self.create_client())
+
+    def close(self):
+        for client in self._clients:
+            client.close()
+        if self.server is not None:
+            self.server.stop()
@@ -0,0 +1,164 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from ocr_result import OcrResult
+
+
+class OCRCache:
+    """
+    [Step 2: Document Processing] 이미지 바이트 해시 기반 OCR 결과 캐시입니다.
+    - 키: sha256(이미지 바이트 + OCR 기능/옵션)
+    - 값: 압축 직렬화된 OcrResult (단어/좌표 열 단위 JSON)
+    - 용량 상한(max_mb)을 넘으면 가장 오래 사용되지 않은 항목부터 삭제(LRU)합니다.
+    """
+
+    def __init__(self, cache_dir, logger, max_mb=1024):
+        self.cache_dir = cache_dir
+        self.logger = logger
+        self.max_bytes = max_mb * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+        self.warmed = 0
+        self.stale = 0
+        self.mismatched = 0
+        self.evicted = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # 디스크 상태로부터 LRU 인덱스 구성 (최근 사용 순서 = 파일 수정시각)
+        entries = []
+        for name in os.listdir(cache_dir):
+            if not name.endswith(".ocr"): continue
+            path = os.path.join(cache_dir, name)
+            try:
+                st = os.stat(path)
+                entries.append((st.st_mtime, name[:-4], st.st_size))
+            except OSError:
+                continue
+        self._index = OrderedDict((key, size) for _, key, size in sorted(entries))
+        self._total = sum(self._index.values())
+
+    @staticmethod
+    def make_key(content, options):
+        """이미지 바이트와 OCR 기능/옵션 문자열로 캐시 키를 만듭니다."""
+        h = hashlib.sha256()
+        h.update(json.dumps(options, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+        h.update(b"\0")
+        h.update(content)
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.ocr")
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._index:
+                self.misses += 1
+                return None
+            self._index.move_to_end(key)
+        try:
+            with open(self._path(key), 'rb') as f:
+                data = f.read()
+            os.utime(self._path(key))
+            result = OcrResult.from_bytes(data)
+        except Exception as e:
+            self.logger.warning(f"[OCR캐시] 캐시 항목 손상 -> 재요청 ({key[:12]}): {e}")
+            with self._lock:
+                self.misses += 1
+                self._drop(key)
+            return None
+        with self._lock:
+            self.hits += 1
+        return result
+
+    def put(self, key, result):
+        data = result.to_bytes()
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            self.logger.warning(f"[OCR캐시] 저장 실패 ({key[:12]}): {e}")
+            if os.path.exists(tmp_path):
+                try: os.remove(tmp_path)
+                except: pass
+            return
+        with self._lock:
+            self._total -= self._index.pop(key, 0)
+            self._index[key] = len(data)
+            self._total += len(data)
+            while self._total > self.max_bytes and len(self._index) > 1:
+                old_key = next(iter(self._index))
+                self._drop(old_key)
+                self.evicted += 1
+
+    def _drop(self, key):
+        # 호출자가 self._lock 을 잡고 있어야 합니다.
+        self._total -= self._index.pop(key, 0)
+        try: os.remove(self._path(key))
+        except OSError: pass
+
+    def warm_from_sidecars(self, pairs, options, legacy_options=None):
+        """
+        process_single_product 가 남긴 '*_ocr.json' 파일로 캐시를 미리 채웁니다.
+        pairs: [(원본 이미지 경로, ocr json 경로), ...]
+        - 사이드카에 기록된 이미지 해시('image_sha256')가 현재 이미지 바이트와 같을 때만 적재합니다.
+        - 해시가 없는 이전 형식 사이드카는 이미지보다 나중에 만들어진 경우에만 적재합니다.
+        - 사이드카에 기록된 옵션 지문('options_sha256')이 현재 options 와 다르면(타일 분할/업로드 축소 변경) 적재하지 않습니다.
+          지문이 없는 이전 형식 사이드카는 options 가 legacy_options(옵션 기록 이전의 기본 옵션)와 같을 때만 적재합니다.
+        """
+        options_sha256 = OcrResult.options_digest(options)
+        legacy_ok = legacy_options is not None and OcrResult.options_digest(legacy_options) == options_sha256
+        for image_path, json_path in pairs:
+            if not os.path.exists(image_path) or not os.path.exists(json_path):
+                continue
+            try:
+                with open(image_path, 'rb') as f:
+                    content = f.read()
+                key = self.make_key(content, options)
+                with self._lock:
+                    if key in self._index: continue
+                with open(json_path, 'rb') as f:
+                    data = json.loads(f.read().decode('utf-8'))
+                recorded_options = data.get("options_sha256")
+                if recorded_options is not None:
+                    same_options = recorded_options == options_sha256
+                else:
+                    same_options = legacy_ok
+                if not same_options:
+                    # 다른 OCR 옵션(좌표계/분할 방식)으로 만든 결과 -> 적재하지 않음
+                    with self._lock:
+                        self.mismatched += 1
+                    continue
+                recorded = data.get("image_sha256")
+                if recorded is not None:
+                    fresh = recorded == OcrResult.digest(content)
+                else:
+                    fresh = os.path.getmtime(json_path) >= os.path.getmtime(image_path)
+                if not fresh:
+                    # 이미지가 교체된 뒤 남은 사이드카 -> 다른 이미지의 결과이므로 적재하지 않음
+                    with self._lock:
+                        self.stale += 1
+                    continue
+                self.put(key, OcrResult.from_dict(data))
+                with self._lock:
+                    self.warmed += 1
+            except Exception as e:
+                self.logger.warning(f"[OCR캐시] 사이드카 로드 실패 ({os.path.basename(json_path)}): {e}")
+
+    def reset_stats(self):
+        """적중/적재/삭제 집계를 0 으로 되돌립니다. (서비스 모드에서 작업마다 호출, 캐시 내용은 유지)"""
+        with self._lock:
+            self.hits = self.misses = self.warmed = self.stale = self.mismatched = self.evicted = 0
+
+    def log_stats(self, logger=None):
+        log = logger if logger else self.logger
+        total = self.hits + self.misses
+        rate = (self.hits / total * 100) if total else 0.0
+        log.info(f"[OCR캐시] 적중: {self.hits}건, 미적중: {self.misses}건 (적중률 {rate:.1f}%), "
+                 f"사이드카 적재: {self.warmed}건 (변경 이미지 제외 {self.stale}건, 옵션 불일치 제외 {self.mismatched}건), 삭제(LRU): {self.evicted}건, "
+                 f"사용량: {self._total/1024/1024:.1f}/{self.max_bytes/1024/1024:.0f}MB")
@@ -0,0 +1,90 @@
+import json
+import hashlib
+import numpy as np
+from word_table import WordTable
+
+
+class OcrResult:
+    """
+    [Step 2 -> Step 3] OCR 경계에서 Vision 응답을 한 번만 변환해 만드는 경량 결과 객체입니다.
+    - full_text: 전체 텍스트 (text_annotations[0].description)
+    - words: 단어 단위 WordTable (text_annotations[1:])
+    - 사이드카('*_ocr.json')는 들여쓰기 없는 압축 JSON(열 단위 배열)으로 저장/복원합니다.
+      원본 이미지 바이트의 sha256('image_sha256')을 함께 기록해, 이미지가 교체된 뒤에는 재사용되지 않도록 합니다.
+      OCR 옵션(타일 분할/업로드 축소 등) 지문('options_sha256')도 기록해, 다른 옵션으로 만든 결과가 재사용되지 않도록 합니다.
+    """
+    __slots__ = ('full_text', 'words')
+
+    FORMAT = "ns-ocr"
+    VERSION = 1
+
+    def __init__(self, full_text, words):
+        self.full_text = full_text
+        self.words = words
+
+    def __bool__(self):
+        return len(self.words) > 0
+
+    def __len__(self):
+        # 기존 text_annotations 리스트와 같은 길이 (0번 전체 텍스트 + 단어 수)
+        return len(self.words) + 1 if len(self.words) else 0
+
+    @classmethod
+    def from_response(cls, response):
+        """AnnotateImageResponse 를 변환합니다."""
+        annotations = list(response.text_annotations)
+        full_text = annotations[0].description if annotations else ""
+        return cls(full_text, WordTable.from_annotations(annotations[1:]))
+
+    @staticmethod
+    def digest(content):
+        """사이드카에 기록하는 이미지 바이트 해시 (sha256 hex)"""
+        return hashlib.sha256(content).hexdigest()
+
+    @staticmethod
+    def options_digest(options):
+        """사이드카에 기록하는 OCR 기능/옵션 지문 (정렬된 JSON 의 sha256 hex)"""
+        return hashlib.sha256(json.dumps(options, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+    def to_dict(self, image_sha256=None, options_sha256=None):
+        boxes = np.stack([self.words.x0, self.words.y0, self.words.x1, self.words.y1], axis=1) if len(self.words) else np.zeros((0, 4))
+        data = {"format": self.FORMAT, "version": self.VERSION, "text": self.full_text,
+                "words": list(self.words.descriptions), "boxes": boxes.astype(int).tolist()}
+        if image_sha256:
+            data["image_sha256"] = image_sha256
+        if options_sha256:
+            data["options_sha256"] = options_sha256
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        """압축 사이드카 형식과 기존 MessageToDict 형식('textAnnotations')을 모두 읽습니다."""
+        if data.get("format") == cls.FORMAT:
+            return cls(data.get("text", ""), WordTable.from_columns(data.get("words", []), data.get("boxes", [])))
+
+        annotations = data.get("textAnnotations", [])
+        full_text = annotations[0].get("description", "") if annotations else ""
+        descriptions, boxes = [], []
+        for ann in annotations[1:]:
+            vertices = ann.get("boundingPoly", {}).get("vertices", [])
+            xs = [v.get("x", 0) for v in vertices] or [0]
+            ys = [v.get("y", 0) for v in vertices] or [0]
+            descriptions.append(ann.get("description", ""))
+            boxes.append([min(xs), min(ys), max(xs), max(ys)])
+        return cls(full_text, WordTable.from_columns(descriptions, boxes))
+
+    def to_bytes(self, image_sha256=None, options_sha256=None):
+        return json.dumps(self.to_dict(image_sha256, options_sha256), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls.from_dict(json.loads(data.decode('utf-8')))
+
+    def save(self, path, image_sha256=None, options_sha256=None):
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes(image_sha256, options_sha256))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
@@ -0,0 +1,193 @@
+import os
+import io
+import time
+import queue
+import threading
+
+from findings_report import FindingsReport
+
+# 단계 종료 신호
+_STOP = object()
+
+
+class ProductContext:
+    """파이프라인을 흐르는 상품 단위 상태 (이미지별 결과를 모아 입력 순서대로 재조립합니다)."""
+
+    def __init__(self, product_folder_path, product_code, product_output_dir, logger):
+        self.product_folder_path = product_folder_path
+        self.product_code = product_code
+        self.product_output_dir = product_output_dir
+        self.logger = logger
+        self.remaining = 0
+        self.total = 0
+        self.started = time.perf_counter()
+        self.results = {}  # index -> (issues, saved_path)
+        self.lock = threading.Lock()
+
+    def finish_item(self, index, result):
+        """이미지 1장 처리 완료. 상품의 마지막 이미지였다면 True 를 반환합니다."""
+        with self.lock:
+            if result is not None:
+                self.results[index] = result
+            self.remaining -= 1
+            return self.remaining == 0
+
+
+class PipelineRunner:
+    """
+    [Main Processor] 4단계(읽기 -> OCR -> 매칭/드로잉 -> 병합/엑셀)를 단계별 스레드 풀과
+    크기 제한 큐로 연결한 생산자/소비자 파이프라인입니다.
+    - 다음 이미지 읽기, OCR 요청, 매칭/드로잉, 끝난 상품의 병합/엑셀 저장이 동시에 진행됩니다.
+    - 큐 크기 제한(backpressure)으로 메모리에 올라가는 이미지 바이트 수가 제한됩니다.
+    - 상품별 이슈/이미지 순서는 이미지 인덱스 기준으로 재조립되므로 순차 실행과 결과가 같습니다.
+    """
+    STAGES = ('read', 'ocr', 'post', 'export')
+
+    def __init__(self, modules, config, main_logger, product_logger_factory, export_fn,
+                 workers=None, queue_size=8, manifest=None):
+        self.pre_proc, self.doc_proc, self.post_proc, self.img_handler = modules
+        self.config = config
+        self.main_logger = main_logger
+        self.product_logger_factory = product_logger_factory
+        self.export_fn = export_fn
+        self.manifest = manifest
+        self.workers = {'read': 2, 'ocr': 4, 'post': 2, 'export': 1}
+        self.workers.update(workers or {})
+        self.queues = {stage: queue.Queue(maxsize=queue_size) for stage in self.STAGES}
+        self.results = {}
+        self._results_lock = threading.Lock()
+
+    def _set_result(self, ctx, status):
+        with self._results_lock:
+            self.results[ctx.product_folder_path] = {"code": ctx.product_code, "status": status}
+
+    # ---------------------------------------------------------
+    # Stage 0: 폴더 스캔 (단일 스레드) -> read 큐
+    # ---------------------------------------------------------
+    def _scan(self, product_folders, category):
+        for product_folder_path in product_folders:
+            product_code = os.path.basename(product_folder_path)
+            product_output_dir = os.path.join(self.config['base_output_dir'], product_code)
+            os.makedirs(product_output_dir, exist_ok=True)
+            logger = self.product_logger_factory(product_code, product_output_dir)
+            logger.info(f">>> [처리 시작] 경로: {product_folder_path}")
+            ctx = ProductContext(product_folder_path, product_code, product_output_dir, logger)
+
+            try:
+                task = {"product_code": product_code, "category": category, "image_folder_path": product_folder_path}
+                idp_items = self.pre_proc.create_idp_items(task, self.config)
+            except Exception as e:
+                logger.error(f"치명적 오류: {e}")
+                self._set_result(ctx, "FAIL")
+                continue
+
+            if not idp_items:
+                logger.warning("이미지 없음.")
+                self._set_result(ctx, "SKIP")
+                continue
+
+            if self.manifest and self.manifest.begin(ctx.product_code, product_output_dir,
+                                                     [item['input_path'] for item in idp_items.values()],
+                                                     self.post_proc.master_digest, self.config.get('manifest_settings'),
+                                                     skip_unchanged=self.config.get('resume', False)):
+                logger.info("<<< [건너뜀] 입력/사전/설정 변경 없음 (이전 결과 유지)")
+                if self.config.get('findings'):
+                    self.config['findings'].append_unchanged(ctx.product_code, self.manifest.findings(ctx.product_code))
+                self._set_result(ctx, "UNCHANGED")
+                continue
+
+            self.doc_proc.warm_cache([(item['input_path'], self._json_path(ctx, item)) for item in idp_items.values()])
+            ctx.remaining = ctx.total = len(idp_items)
+            for item in idp_items.values():
+                self.queues['read'].put((ctx, item))
+
+    def _json_path(self, ctx, item):
+        return os.path.join(ctx.product_output_dir, f"{item['file_name']}_ocr.json")
+
+    def _item_failed(self, ctx, item, e):
+        ctx.logger.error(f"이미지 에러 ({item['file_name']}): {e}")
+        if ctx.finish_item(item['index'], None):
+            self.queues['export'].put(ctx)
+
+    # ---------------------------------------------------------
+    # Stage 1~4 워커
+    # ---------------------------------------------------------
+    def _read_worker(self, ctx, item):
+        with io.open(item['input_path'], 'rb') as f:
+            content = f.read()
+        self.queues['ocr'].put((ctx, item, content))
+
+    def _ocr_worker(self, ctx, item, content):
+        item['ocr_data'] = self.doc_proc.run(item['input_path'], save_json_path=self._json_path(ctx, item), content=content)
+        self.queues['post'].put((ctx, item))
+
+    def _post_worker(self, ctx, item):
+        # 이슈에는 번호가 저장되지 않으므로, 이미지 인덱스 순으로 재조립하면 순차 실행과 동일한 결과가 됩니다.
+        # 프로세스 풀 모드면 매칭/드로잉을 워커 프로세스에 맡기고 결과를 기다립니다.
+        post_runner = self.config.get('post_pool') or self.post_proc
+        issues, saved_path = post_runner.process_one_image(item, start_index=1, logger=ctx.logger,
+                                                           in_memory=self.config.get('in_memory_annotation', False))
+        if ctx.finish_item(item['index'], (issues, saved_path)):
+            self.queues['export'].put(ctx)
+
+    def _export_worker(self, ctx, category, review_type):
+        processed_img_paths, all_issues = [], []
+        for index in sorted(ctx.results):
+            issues, saved_path = ctx.results[index]
+            all_issues.extend(issues)
+            processed_img_paths.append(saved_path)
+        self.export_fn(ctx.product_code, ctx.product_output_dir, category, review_type, self.config,
+                       self.post_proc, self.img_handler, processed_img_paths, all_issues, ctx.logger)
+        self.post_proc.metrics.observe('product', time.perf_counter() - ctx.started, product=ctx.product_code)
+        # 실패한 이미지가 있으면 완료로 기록하지 않아 다음 실행에서 다시 처리(재개)합니다.
+        if self.manifest and len(ctx.results) == ctx.total:
+            self.manifest.complete(ctx.product_code, ctx.product_output_dir,
+                                   FindingsReport.make_rows(ctx.product_code, category, review_type, all_issues))
+        ctx.logger.info(f"<<< [완료] 적발: {len(all_issues)}건")
+        self._set_result(ctx, "SUCCESS")
+
+    def _stage_loop(self, stage, handler):
+        q = self.queues[stage]
+        while True:
+            job = q.get()
+            if job is _STOP:
+                break
+            try:
+                if stage == 'export':
+                    handler(job)
+                else:
+                    handler(*job)
+            except Exception as e:
+                if stage == 'export':
+                    job.logger.error(f"치명적 오류: {e}")
+                    self._set_result(job, "FAIL")
+                else:
+                    self._item_failed(job[0], job[1], e)
+
+    def run(self, product_folders, category, review_type):
+        """모든 상품을 파이프라인으로 처리하고, 입력 순서대로 상품별 결과 목록을 반환합니다."""
+        handlers = {
+            'read': self._read_worker,
+            'ocr': self._ocr_worker,
+            'post': self._post_worker,
+            'export': lambda ctx: self._export_worker(ctx, category, review_type),
+        }
+        threads = {}
+        for stage in self.STAGES:
+            threads[stage] = [threading.Thread(target=self._stage_loop, args=(stage, handlers[stage]),
+                                               name=f"Pipe_{stage}_{i}", daemon=True)
+                              for i in range(max(1, int(self.workers[stage])))]
+            for t in threads[stage]: t.start()
+
+        self.main_logger.info("[파이프라인] 단계별 워커 수: " + ", ".join(f"{s}={len(threads[s])}" for s in self.STAGES))
+
+        self._scan(product_folders, category)
+
+        # 앞 단계부터 순서대로 종료: 앞 단계 워커가 모두 끝나야 다음 단계 큐에 더 이상 작업이 들어오지 않습니다.
+        for stage in self.STAGES:
+            for _ in threads[stage]:
+                self.queues[stage].put(_STOP)
+            for t in threads[stage]:
+                t.join()
+
+        return [self.results.get(p, {"code": os.path.basename(p), "status": "FAIL"}) for p in product_folders]
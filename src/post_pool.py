@@ -0,0 +1,89 @@
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from ocr_result import OcrResult
+from word_table import WordTable
+from metrics import RunMetrics
+from postprocessing import PostProcessor
+
+# 워커에 넘기는 이미지 항목 필드 (OCR 결과는 단어 테이블만 따로 전달)
+_ITEM_KEYS = ('input_path', 'temp_path', 'category', 'product_code', 'file_name')
+
+# ---------------------------------------------------------
+# 워커 프로세스 측
+# ---------------------------------------------------------
+_worker_post_proc = None
+_worker_records = []
+
+
+class _RecordCapture(logging.Handler):
+    """워커에서 남긴 로그를 모아 두었다가 결과와 함께 돌려보냅니다."""
+
+    def emit(self, record):
+        _worker_records.append((record.levelno, record.getMessage()))
+
+
+def _init_worker(master_data, matcher, line_cache_size):
+    """워커 시작 시 한 번만 실행: 컴파일된 사전으로 PostProcessor 를 만듭니다."""
+    global _worker_post_proc
+    logger = logging.getLogger("NS_OCR_PostWorker")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.handlers = [_RecordCapture()]
+    _worker_post_proc = PostProcessor.from_compiled(master_data, matcher, logger, line_cache_size=line_cache_size)
+
+
+def _process_item(item, start_index, in_memory):
+    del _worker_records[:]
+    metrics = RunMetrics()
+    _worker_post_proc.metrics = metrics
+    issues, saved = _worker_post_proc.process_one_image(item, start_index=start_index, in_memory=in_memory)
+    return issues, saved, list(_worker_records), metrics.raw()
+
+
+class PostProcessPool:
+    """
+    [Step 3: Post-processing] 매칭/줄 묶기/박스 드로잉·인코딩을 별도 프로세스에서 실행하는 풀입니다.
+    OCR 워커 스레드들이 GIL 때문에 후처리에 코어 1개 정도밖에 쓰지 못하는 문제를 피하기 위한 것입니다.
+    - 컴파일된 사전(master_data, matcher)은 워커 시작 시 initializer 로 한 번만 전달됩니다.
+    - 작업마다 프로세스 경계를 넘는 데이터는 단어 테이블(WordTable)/경로와 이슈 목록뿐입니다. (protobuf, 픽셀 미전송)
+    - 워커의 로그와 지표는 결과와 함께 돌려받아 호출한 쪽의 상품 로거/RunMetrics 에 기록합니다.
+    - Windows 와 같은 방식(spawn)으로 워커를 띄우므로 실행 중인 스레드/잠금 상태를 복제하지 않습니다.
+    """
+
+    def __init__(self, post_proc, logger, workers):
+        self.post_proc = post_proc
+        self.logger = logger
+        self.workers = max(1, int(workers))
+        initargs = (post_proc.master_data, post_proc.matcher, post_proc.line_cache.max_entries)
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                            initializer=_init_worker, initargs=initargs)
+        self.logger.info(f"[후처리풀] 프로세스 {self.workers}개로 매칭/드로잉 실행")
+
+    def submit(self, item, start_index=1, in_memory=False):
+        payload = {k: item.get(k) for k in _ITEM_KEYS}
+        ocr_data = item.get('ocr_data')
+        if ocr_data and not isinstance(ocr_data, OcrResult):
+            # protobuf text_annotations 리스트는 여기서 단어 테이블로 변환해 보냅니다.
+            ocr_data = OcrResult("", WordTable.from_annotations(ocr_data[1:]))
+        payload['ocr_data'] = OcrResult("", ocr_data.words) if ocr_data else None
+        return self.executor.submit(_process_item, payload, start_index, in_memory)
+
+    def result(self, future, logger=None):
+        """submit() 결과를 기다려 (이슈 목록, 저장 경로 또는 AnnotatedImage) 를 반환합니다."""
+        issues, saved, records, raw = future.result()
+        log = logger if logger else self.logger
+        for level, message in records:
+            log.log(level, message)
+        self.post_proc.metrics.merge(raw)
+        # 워커별 줄 매칭 캐시 적중률을 실행 통계에 합산
+        counters = raw[1]
+        self.post_proc.line_cache.add_stats(counters.get('line_cache_hits', 0), counters.get('line_cache_misses', 0))
+        return issues, saved
+
+    def process_one_image(self, item, start_index=1, logger=None, in_memory=False):
+        return self.result(self.submit(item, start_index, in_memory), logger)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
@@ -1,17 +1,59 @@
 import os
 import re
-import pandas as pd
+import csv
+import time
+import bisect
+import numpy as np
 import unicodedata
-from PIL import Image, ImageDraw, ImageFont
+from itertools import zip_longest
+from PIL import Image
+
+from image_handler import AnnotatedImage
+from matcher import KeywordMatcher
+from master_cache import MasterCache
+from word_table import WordTable
+from ocr_result import OcrResult
+from metrics import NULL_METRICS
+from match_cache import LineMatchCache
 
 class PostProcessor:
-    def __init__(self, master_paths, logger):
+    def __init__(self, master_paths, logger, cache_dir=None, metrics=None, line_cache_size=50000):
         self.main_logger = logger
+        self.metrics = metrics or NULL_METRICS
+        # 반복되는 줄(안내 문구 등)의 매칭 결과 캐시 (0 이면 미사용)
+        self.line_cache = LineMatchCache(line_cache_size)
         self.main_logger.info("[마스터로드] 데이터 로드 시작...")
-        self.master_data = self._load_master_data(master_paths)
-        self.patterns = self._prepare_patterns()
+
+        # 마스터 파일이 바뀌지 않았다면 디스크 캐시에서 키워드 Set 과 컴파일된 매처를 바로 로드
+        master_cache = MasterCache(cache_dir, logger) if cache_dir else None
+        fingerprint = MasterCache.fingerprint(master_paths)
+        # 실행 매니페스트(RunManifest)에서 사전 변경 여부를 판단하는 내용 기준 지문
+        self.master_digest = MasterCache.content_digest(fingerprint)
+        cached = master_cache.load(fingerprint) if master_cache else None
+
+        if cached:
+            self.master_data, self.matcher = cached
+            for key, name in (('ban', "금칙어"), ('ftc', "공정위"), ('except', "예외어")):
+                if self.master_data.get(key):
+                    self.main_logger.info(f"[마스터로드] '{name}' 캐시 로드 완료: {len(self.master_data[key])}개 키워드")
+        else:
+            self.master_data = self._load_master_data(master_paths)
+            self.matcher = self._prepare_patterns()
+            if master_cache:
+                master_cache.save(fingerprint, self.master_data, self.matcher)
         self.main_logger.info("[마스터로드] 검사 준비 완료.")
 
+    @classmethod
+    def from_compiled(cls, master_data, matcher, logger, metrics=None, line_cache_size=50000):
+        """이미 로드/컴파일된 사전으로 만듭니다. (프로세스 풀 워커가 마스터 파일을 다시 읽지 않도록)"""
+        self = cls.__new__(cls)
+        self.main_logger = logger
+        self.metrics = metrics or NULL_METRICS
+        self.line_cache = LineMatchCache(line_cache_size)
+        self.master_data, self.matcher = master_data, matcher
+        self.master_digest = None
+        return self
+
     def _normalize(self, text):
         if not isinstance(text, str): text = str(text)
         return unicodedata.normalize('NFC', text)
@@ -23,52 +65,78 @@ class PostProcessor:
         data['except'] = self._read_file(paths.get('except'), "예외어")
         return data
 
+    # 기존 pandas 로더가 결측값으로 취급하던 셀 문자열 (같은 키워드 집합을 만들기 위해 그대로 제외)
+    _NA_STRINGS = frozenset(["", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+                             "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"])
+
+    def _iter_cells(self, path, encoding='utf-8-sig'):
+        """
+        마스터 파일의 셀 값을 행 순서대로 하나씩 돌려줍니다. (DataFrame 을 만들지 않는 스트리밍 읽기)
+        - .xlsx: openpyxl read_only 모드로 첫 번째 시트(Sheet1)만 행 단위로 읽습니다.
+        - .xls: openpyxl 이 지원하지 않으므로 pandas(xlrd)로 읽습니다.
+        - CSV: csv 모듈로 한 줄씩 읽습니다.
+        """
+        lower = path.lower()
+        if lower.endswith('.xlsx'):
+            from openpyxl import load_workbook
+            wb = load_workbook(path, read_only=True, data_only=True)
+            try:
+                for row in wb.worksheets[0].iter_rows(values_only=True):
+                    yield from row
+            finally:
+                wb.close()
+        elif lower.endswith('.xls'):
+            import pandas as pd
+            yield from pd.read_excel(path, sheet_name=0, header=None).values.flatten()
+        else:
+            with open(path, 'r', encoding=encoding, newline='') as f:
+                for row in csv.reader(f):
+                    yield from row
+
+    def _extract_keywords(self, cells):
+        keywords = set()
+        for val in cells:
+            if val is None or val != val: continue  # 빈 셀 / NaN
+            text = str(val)
+            if isinstance(val, str) and text in self._NA_STRINGS: continue
+
+            # 쉼표, 세미콜론, 줄바꿈 단위로 토큰 분리
+            for word in re.split(r'[,;\n]', text):
+                # 공백 제거 및 유니코드 정규화(NFC) 수행
+                clean_word = re.sub(r'\s+', '', self._normalize(word))
+                
+                # 유효성 검사: 빈 문자열, 단순 숫자, 1글자 한글 제외
+                if not clean_word or clean_word.isdigit(): continue
+                if len(clean_word) == 1 and '가' <= clean_word <= '힣': continue
+                
+                keywords.add(clean_word)
+        return keywords
+
     def _read_file(self, path: str, name: str) -> set:
         """
         [Step 3: Post-processing] 마스터 엑셀/CSV 파일에서 키워드를 추출하여 Set으로 반환합니다.
-        - 최적화: 엑셀 로드 시 첫 번째 시트(Sheet1)만 읽어 메모리 효율성을 극대화합니다.
+        - 최적화: 첫 번째 시트(Sheet1)만 스트리밍으로 읽어 셀 값을 바로 키워드 추출에 넘깁니다.
         """
         if not path or not os.path.exists(path):
             if path: 
                 self.main_logger.warning(f"[마스터로드] 파일 없음: {name} (경로: {path})")
             return set()
         
-        keywords = set()
         try:
             # 엑셀 파일 처리 분기
             if path.lower().endswith(('.xlsx', '.xls')):
                 try:
-                    # [핵심 수정] sheet_name=0 으로 지정하여 무조건 첫 번째 시트만 DataFrame으로 로드
-                    # header=None을 유지하여 첫 번째 행의 데이터 유실을 방지합니다.
-                    df = pd.read_excel(path, sheet_name=0, header=None)
-                    df_list = [df]  # 하위 로직(반복문)과의 호환성을 위해 리스트로 래핑
+                    keywords = self._extract_keywords(self._iter_cells(path))
                 except Exception as ex:
                     self.main_logger.error(f"[마스터로드] {name} 엑셀 시트 파싱 에러 ({path}): {ex}")
                     return set()
             # CSV 파일 처리 분기
             else:
-                try: 
-                    df_list = [pd.read_csv(path, header=None)]
-                except Exception: 
-                    # utf-8 실패 시 cp949(EUC-KR) 폴백 처리
-                    df_list = [pd.read_csv(path, encoding='cp949', header=None)]
-
-            # 데이터 정제 및 키워드 추출 파이프라인
-            for df in df_list:
-                for val in df.values.flatten():
-                    if pd.isna(val): continue
-                    
-                    text = str(val)
-                    # 쉼표, 세미콜론, 줄바꿈 단위로 토큰 분리
-                    for word in re.split(r'[,;\n]', text):
-                        # 공백 제거 및 유니코드 정규화(NFC) 수행
-                        clean_word = re.sub(r'\s+', '', self._normalize(word))
-                        
-                        # 유효성 검사: 빈 문자열, 단순 숫자, 1글자 한글 제외
-                        if not clean_word or clean_word.isdigit(): continue
-                        if len(clean_word) == 1 and '가' <= clean_word <= '힣': continue
-                        
-                        keywords.add(clean_word)
+                try:
+                    keywords = self._extract_keywords(self._iter_cells(path))
+                except UnicodeDecodeError:
+                    # utf-8 실패 시 cp949(EUC-KR) 로 처음부터 다시 읽기
+                    keywords = self._extract_keywords(self._iter_cells(path, encoding='cp949'))
 
             self.main_logger.info(f"[마스터로드] '{name}' 로드 완료 (Sheet1 전용): {len(keywords)}개 키워드 추출됨")
             return keywords
@@ -77,107 +145,89 @@ class PostProcessor:
             self.main_logger.error(f"[마스터로드] {name} 전체 읽기 프로세스 치명적 에러: {e}")
             return set()
 
-    # postprocessing.py 내 _prepare_patterns 수정 제안
     def _prepare_patterns(self):
-        patterns = {}
-        for key in ['except', 'ban', 'ftc']:
-            keywords = self.master_data.get(key, set())
-            if not keywords:
-                patterns[key] = []
-                continue
-            
-            regex_list = []
-            for k in sorted(keywords, key=len, reverse=True):
-                clean_k = re.sub(r'\s+', '', k) 
-                fuzzy_k = r"[\s\W]*".join(re.escape(c) for c in clean_k)
-                
-                # [수정] 모든 키워드에 대해 한국어 단어 경계 조건 추가
-                # 앞뒤에 한글이 더 붙어있지 않은 경우에만 매칭 (조사/공백/특수문자는 허용)
-                pattern = rf"(?<![가-힣]){fuzzy_k}(?![가-힣])"
-                
-                regex_list.append((k, re.compile(pattern, re.IGNORECASE)))
-            patterns[key] = regex_list
-        return patterns
-
-    def _group_into_lines(self, ocr_texts):
-        if not ocr_texts: return []
-        sorted_texts = sorted(ocr_texts, key=lambda t: min(v.y for v in t.bounding_poly.vertices))
-        lines = []
-        current_line = []
-        last_y = -1
-        y_tolerance = 15
-
-        for text in sorted_texts:
-            vertices = text.bounding_poly.vertices
-            min_y, max_y = min(v.y for v in vertices), max(v.y for v in vertices)
-            center_y = (min_y + max_y) / 2
-            if last_y == -1:
-                current_line.append(text)
-                last_y = center_y
-            else:
-                if abs(center_y - last_y) <= y_tolerance:
-                    current_line.append(text)
-                else:
-                    lines.append(current_line)
-                    current_line = [text]
-                    last_y = center_y
-        if current_line: lines.append(current_line)
+        """
+        예외어/금칙어/공정위 키워드 전체를 단일 패스 매처(KeywordMatcher)로 컴파일합니다.
+        - 키워드 수와 무관하게 한 줄을 한 번만 스캔합니다. (글자 사이 공백/특수문자 허용 + 한국어 단어 경계 유지)
+        """
+        return KeywordMatcher(self.master_data)
 
+    def _group_into_lines(self, table):
+        """
+        WordTable 의 단어들을 줄 단위로 묶습니다.
+        각 줄은 텍스트, 영역, 단어 인덱스 배열과 함께 줄 텍스트 안의 단어별 시작/끝 오프셋(starts/ends)을 가집니다.
+        """
+        if not table or len(table) == 0: return []
         structured_lines = []
-        for line in lines:
-            line.sort(key=lambda t: min(v.x for v in t.bounding_poly.vertices))
-            raw_text = " ".join([t.description for t in line])
+        for word_idx in table.group_lines(y_tolerance=15):
+            raw_text = " ".join([table.descriptions[i] for i in word_idx])
             full_text = self._normalize(raw_text)
-            all_vertices = [v for t in line for v in t.bounding_poly.vertices]
-            min_x, min_y = min(v.x for v in all_vertices), min(v.y for v in all_vertices)
-            max_x, max_y = max(v.x for v in all_vertices), max(v.y for v in all_vertices)
-            structured_lines.append({"text": full_text, "bbox": [min_x, min_y, max_x, max_y], "raw_words": line})
+            # 줄 텍스트는 단어를 공백 1칸으로 이어붙인 것이므로 단어별 시작 오프셋 = 누적(길이 + 1)
+            lens = table.norm_lens[word_idx]
+            starts = np.concatenate(([0], np.cumsum(lens + 1)[:-1]))
+            structured_lines.append({"text": full_text, "bbox": table.bbox(word_idx), "word_idx": word_idx,
+                                     "starts": starts.tolist(), "ends": (starts + lens).tolist()})
         return structured_lines
 
-    def _get_match_bbox(self, raw_words, match_obj):
-        if not match_obj or not raw_words: return None
+    def _get_match_bbox(self, table, line_info, match_obj):
+        """매칭 구간 [start, end) 와 겹치는 단어들의 영역을 이진 탐색 + 슬라이스로 구합니다."""
+        if not match_obj or len(line_info['word_idx']) == 0: return None
         start_idx, end_idx = match_obj.start(), match_obj.end()
-        current_idx = 0
-        target_vertices = []
-        for word in raw_words:
-            w_len = len(self._normalize(word.description))
-            w_start, w_end = current_idx, current_idx + w_len
-            if max(start_idx, w_start) < min(end_idx, w_end):
-                target_vertices.extend(word.bounding_poly.vertices)
-            current_idx += (w_len + 1)
-        if not target_vertices: return None
-        return [min(v.x for v in target_vertices), min(v.y for v in target_vertices),
-                max(v.x for v in target_vertices), max(v.y for v in target_vertices)]
+        starts, ends = line_info['starts'], line_info['ends']
+
+        # 첫 후보: start_idx 이전에 시작하는 마지막 단어 (그 단어가 start_idx 전에 끝나면 다음 단어)
+        first = max(bisect.bisect_right(starts, start_idx) - 1, 0)
+        if first < len(ends) and ends[first] <= start_idx: first += 1
+        # 마지막 후보: end_idx 이전에 시작하는 단어까지
+        last = bisect.bisect_left(starts, end_idx)
+        if first >= last: return None
+
+        hit = line_info['word_idx'][first:last]
+        # 길이 0 인 단어는 어떤 구간과도 겹치지 않음
+        hit = hit[table.norm_lens[hit] > 0]
+        if len(hit) == 0: return None
+        return table.bbox(hit)
 
     def _find_all_matches(self, text):
         """한 줄의 텍스트에서 예외어, 금칙어, 공정위 단어를 찾아냅니다. (예외어는 리포팅에서 제외)"""
         all_issues = []
         mask = [False] * len(text)
 
+        # 단일 스캔으로 카테고리별 후보를 모두 수집 (긴 키워드 우선 -> 등장 위치 순)
+        candidates = self.matcher.scan(text)
+
         # 1. 예외어 처리: 마스킹(Masking)만 수행하고 이슈 목록에는 넣지 않습니다.
-        for k, pat in self.patterns.get('except', []):
-            for m in pat.finditer(text):
-                # 기존에 있던 all_issues.append(...) 코드를 삭제합니다.
-                for i in range(m.start(), m.end()): mask[i] = True
-
-        # 2. 금칙어 처리
-        for k, pat in self.patterns.get('ban', []):
-            for m in pat.finditer(text):
-                if not any(mask[m.start():m.end()]):
-                    all_issues.append({'type': 'ban', 'match': m, 'keyword': k})
-                    for i in range(m.start(), m.end()): mask[i] = True
+        for k, m in candidates['except']:
+            for i in range(m.start(), m.end()): mask[i] = True
 
-        # 3. 공정위 처리
-        for k, pat in self.patterns.get('ftc', []):
-            for m in pat.finditer(text):
+        # 2. 금칙어 처리 / 3. 공정위 처리
+        for t_key in ('ban', 'ftc'):
+            for k, m in candidates[t_key]:
                 if not any(mask[m.start():m.end()]):
-                    all_issues.append({'type': 'ftc', 'match': m, 'keyword': k})
+                    all_issues.append({'type': t_key, 'match': m, 'keyword': k})
                     for i in range(m.start(), m.end()): mask[i] = True
 
         all_issues.sort(key=lambda x: x['match'].start())
         return all_issues
 
-    def process_one_image(self, item, start_index=1, logger=None):
+    def _find_line_matches(self, text):
+        """_find_all_matches 의 캐시 경유 버전. 같은 줄 텍스트는 이미지/상품이 달라도 한 번만 매칭합니다."""
+        cached = self.line_cache.get(text)
+        if cached is not None:
+            self.metrics.count('line_cache_hits')
+            return [{'type': t_key, 'match': m, 'keyword': k} for t_key, k, m in cached]
+        self.metrics.count('line_cache_misses')
+        found = self._find_all_matches(text)
+        self.line_cache.put(text, tuple((x['type'], x['keyword'], x['match']) for x in found))
+        return found
+
+    def process_one_image(self, item, start_index=1, logger=None, in_memory=False):
+        """
+        이미지 1장의 매칭/박스 표시를 수행합니다.
+        - 기본: 박스를 그린 이미지를 temp 파일로 저장하고 (이슈 목록, temp 경로)를 반환합니다.
+        - in_memory=True: 이미지를 다시 저장하지 않고 (이슈 목록, AnnotatedImage(원본 경로 + 박스 목록))을 반환합니다.
+          박스는 ImageHandler 가 병합하면서 직접 그립니다.
+        """
         log = logger if logger else self.main_logger
         temp_path = item['temp_path']
         page_number = 0 # [수정] 레거시 호환을 위해 0으로 하드코딩
@@ -186,25 +236,29 @@ class PostProcessor:
 
         current_issues = []
         issue_counter = start_index
+        metric_labels = {"product": item.get('product_code'), "image": item.get('file_name')}
+        start_time = time.perf_counter()
 
         try:
             if not ocr_result:
+                if in_memory: return [], AnnotatedImage(item['input_path'], [])
                 if os.path.exists(item['input_path']): Image.open(item['input_path']).save(temp_path)
                 return [], temp_path
 
+            boxes = []
+            # 박스 좌표 보정에는 이미지 크기만 필요하므로 헤더만 읽습니다.
             with Image.open(item['input_path']) as img:
-                draw = ImageDraw.Draw(img)
-                try: font = ImageFont.truetype("malgun.ttf", 20)
-                except: font = ImageFont.load_default()
-
-                lines = self._group_into_lines(ocr_result[1:])
+                # 단어 테이블은 OCR 경계(OcrResult)에서 이미 만들어져 있으므로 그대로 사용합니다.
+                # (protobuf text_annotations 리스트가 들어온 경우에만 여기서 한 번 변환)
+                table = ocr_result.words if isinstance(ocr_result, OcrResult) else WordTable.from_annotations(ocr_result[1:])
+                lines = self._group_into_lines(table)
                 
                 for line_info in lines:
                     text_content = line_info['text']
                     if not text_content.strip(): continue
 
                     # [수정] 한 줄에서 모든 키워드를 다 찾아냄
-                    found_matches = self._find_all_matches(text_content)
+                    found_matches = self._find_line_matches(text_content)
                     
                     for match_info in found_matches:
                         issue_type = match_info['type']
@@ -219,9 +273,9 @@ class PostProcessor:
                         else:
                             box_color = "black" # except 처리 부분(초록색) 삭제
                         
-                        precise_bbox = self._get_match_bbox(line_info['raw_words'], matched_obj)
-                        if not precise_bbox: x1, y1, x2, y2 = line_info['bbox']
-                        else: x1, y1, x2, y2 = precise_bbox
+                        # 매칭 구간과 겹치는 단어들의 정밀 영역 (없으면 줄 전체 영역)
+                        match_bbox = self._get_match_bbox(table, line_info, matched_obj) or line_info['bbox']
+                        x1, y1, x2, y2 = match_bbox
                         
                         padding = 6
                         expanded_x1 = max(0, x1 - padding)
@@ -229,7 +283,7 @@ class PostProcessor:
                         expanded_x2 = min(img.width, x2 + padding)
                         expanded_y2 = min(img.height, y2 + padding)
                         
-                        draw.rectangle([expanded_x1, expanded_y1, expanded_x2, expanded_y2], outline=box_color, width=4)
+                        boxes.append(([expanded_x1, expanded_y1, expanded_x2, expanded_y2], box_color, 4))
 
                         current_issues.append({
                             "type": issue_type, "category": category_name,
@@ -248,7 +302,7 @@ class PostProcessor:
                         expanded_x2 = min(img.width, x2 + padding)
                         expanded_y2 = min(img.height, y2 + padding)
                         
-                        draw.rectangle([expanded_x1, expanded_y1, expanded_x2, expanded_y2], outline=box_color, width=4)
+                        boxes.append(([expanded_x1, expanded_y1, expanded_x2, expanded_y2], box_color, 4))
 
                         current_issues.append({
                             "type": issue_type, "category": category_name,
@@ -260,7 +314,19 @@ class PostProcessor:
                         })
                         issue_counter += 1
 
-                img.save(temp_path)
+            self.metrics.observe('match', time.perf_counter() - start_time, **metric_labels)
+            self.metrics.count('words', len(table))
+            self.metrics.count('lines', len(lines))
+            self.metrics.count('matches', len(current_issues))
+
+            annotated = AnnotatedImage(item['input_path'], boxes)
+            if in_memory:
+                return current_issues, annotated
+
+            with self.metrics.timer('draw', **metric_labels):
+                with Image.open(item['input_path']) as img:
+                    annotated.draw_on(img)
+                    img.save(temp_path)
             return current_issues, temp_path
             
         except Exception as e:
@@ -269,6 +335,25 @@ class PostProcessor:
 
     # [수정] category와 review_type을 필수로 받아 처리하도록 수정
     def save_excel(self, all_issues, output_dir, p_code, category="공산품", review_type="사전", logger=None):
+            with self.metrics.timer('excel', product=p_code):
+                self._save_excel(all_issues, output_dir, p_code, category, review_type, logger)
+
+    # 결과 엑셀 열 구성 (C열은 헤더가 공백 한 칸인 빈 열)
+    REPORT_COLUMNS = ['단어', '실증자료여부 표시', ' ', '페이지 번호', '금지어 또는 한정표현 사전 단어']
+
+    @classmethod
+    def _write_report(cls, save_path, rows=()):
+        """write-only 워크북으로 행을 한 줄씩 기록합니다. (행 수와 무관하게 메모리 사용량 일정)"""
+        from openpyxl import Workbook
+
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("Sheet1")
+        ws.append(cls.REPORT_COLUMNS)
+        for row in rows:
+            ws.append(row)
+        wb.save(save_path)
+
+    def _save_excel(self, all_issues, output_dir, p_code, category="공산품", review_type="사전", logger=None):
             log = logger if logger else self.main_logger
             try:
                 grouped = {'ban': [], 'ftc': [], 'except': []}
@@ -315,27 +400,15 @@ class PostProcessor:
                                 
                         max_len = max(len(tokens_A), len(unique_D))
                         
-                        # [수정 후]
-                        if max_len == 0:
-                            # C열 자리에 빈 공백 문자열(' ')을 헤더로 하는 열 추가
-                            df = pd.DataFrame(columns=['단어', '실증자료여부 표시', ' ', '페이지 번호', '금지어 또는 한정표현 사전 단어'])
-                        else:
-                            df = pd.DataFrame({
-                                '단어': tokens_A + [''] * (max_len - len(tokens_A)),
-                                '실증자료여부 표시': [''] * max_len,
-                                ' ': [''] * max_len,  # C열: 헤더 공백 및 데이터 빈칸 처리
-                                '페이지 번호': pages_C + [''] * (max_len - len(pages_C)),
-                                '금지어 또는 한정표현 사전 단어': unique_D + [''] * (max_len - len(unique_D))
-                            })
-                            
-                        df.to_excel(save_path, index=False)
+                        # A열(토큰)/D열(페이지)과 E열(사전 단어)은 길이가 다를 수 있어 짧은 쪽을 빈칸으로 채움
+                        rows = ((tk, None, None, page, word) for tk, page, word in zip_longest(tokens_A, pages_C, unique_D))
+                        self._write_report(save_path, rows)
                         log.info(f"[결과저장] {os.path.basename(save_path)} 저장 완료 (출력 길이: {max_len}행)")
 
                     else:
                         # 마스터 데이터가 없을 경우 빈 파일 생성
                         if not os.path.exists(save_path):
-                            # 여기도 C열 빈칸 헤더 추가
-                            pd.DataFrame(columns=['단어', '실증자료여부 표시', ' ', '페이지 번호', '금지어 또는 한정표현 사전 단어']).to_excel(save_path, index=False)
+                            self._write_report(save_path)
                             log.info(f"[결과저장] {os.path.basename(save_path)} 빈 파일 생성")
 
             except Exception as e:
@@ -1,11 +1,17 @@
 import os
 import glob
+from metrics import NULL_METRICS
 
 class PreProcessor:
-    def __init__(self, logger):
+    def __init__(self, logger, metrics=None):
         self.logger = logger
+        self.metrics = metrics or NULL_METRICS
 
     def create_idp_items(self, task, config):
+        with self.metrics.timer('scan', product=task['product_code']):
+            return self._create_idp_items(task, config)
+
+    def _create_idp_items(self, task, config):
         p_code = task['product_code']
         input_dir = task['image_folder_path']
         base_output_dir = config['base_output_dir']
@@ -44,6 +50,12 @@ class PreProcessor:
                 "log_prefix": f"[{idx+1}/{len(image_files)}][{file_name}]"
             }
             idp_items[item_id] = item
+
+        # 유사 중복 이미지 검출: 이미지별 지각 해시(dHash)를 실행 전체 색인에 등록 (OCR 단계에서 그룹당 1회만 호출)
+        dedup = config.get('dedup')
+        if dedup is not None:
+            for item in idp_items.values():
+                dedup.add(item['input_path'])
         
         self.logger.info(f"[전처리] 작업 객체(Item) {len(idp_items)}개 생성 완료.")
         return idp_items
\ No newline at end of file
@@ -0,0 +1,144 @@
+import os
+import json
+import hashlib
+import threading
+from datetime import datetime
+
+
+class RunManifest:
+    """
+    [Main Processor] 출력 폴더의 실행 매니페스트('_run_manifest.json')입니다. 상품별로 다음을 기록합니다.
+    - inputs: 입력 이미지별 (크기, 수정시각, sha256) - 크기/수정시각이 같으면 해시를 다시 계산하지 않습니다.
+    - master: 마스터 사전 내용 지문 / settings: 결과에 영향을 주는 설정 (카테고리, 심의타입, OCR 옵션 등)
+    - artifacts: 완료 시점의 결과 파일 목록 (상대경로, 크기)
+    - findings: 완료 시점의 적발 행 (건너뛴 상품도 실행별 통합 CSV 에 이전 결과를 옮겨 적기 위함)
+    - status: started(진행 중/중단) / done(완료)
+
+    입력/사전/설정이 같고 결과 파일이 모두 남아 있는 'done' 상품은 다시 처리하지 않습니다.
+    중단된(started) 상품은 다시 처리하되, 남아 있는 '*_ocr.json' 이 OCR 캐시를 예열하므로 끝난 이미지는 API 를 다시 호출하지 않습니다.
+    """
+    FILE_NAME = "_run_manifest.json"
+    VERSION = 1
+
+    def __init__(self, output_root, logger):
+        self.path = os.path.join(output_root, self.FILE_NAME)
+        self.logger = logger
+        self._lock = threading.Lock()
+        self.counts = {"unchanged": 0, "new": 0, "changed": 0, "resumed": 0, "forced": 0}
+        self.products = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get("version") == self.VERSION:
+                    self.products = data.get("products", {})
+            except Exception as e:
+                self.logger.warning(f"[매니페스트] 기존 매니페스트 읽기 실패 (전체 재처리): {e}")
+
+    # ---------------------------------------------------------
+    # 입력 지문
+    # ---------------------------------------------------------
+    def _hash_inputs(self, product_code, image_paths):
+        """{파일명: [크기, 수정시각(ns), sha256]} (이전 기록과 크기/수정시각이 같으면 기록된 해시 재사용)"""
+        with self._lock:
+            previous = self.products.get(product_code, {}).get("inputs", {})
+        inputs = {}
+        for path in image_paths:
+            st = os.stat(path)
+            name = os.path.basename(path)
+            old = previous.get(name)
+            if old and old[0] == st.st_size and old[1] == st.st_mtime_ns:
+                inputs[name] = old
+                continue
+            h = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    h.update(chunk)
+            inputs[name] = [st.st_size, st.st_mtime_ns, h.hexdigest()]
+        return inputs
+
+    @staticmethod
+    def _same_inputs(a, b):
+        # 수정시각만 바뀐 경우(복사/재다운로드)는 내용이 같으므로 변경 없음으로 봅니다.
+        return {k: v[2] for k, v in a.items()} == {k: v[2] for k, v in b.items()}
+
+    def _artifacts_present(self, product_output_dir, artifacts):
+        for rel_path, size in artifacts:
+            path = os.path.join(product_output_dir, rel_path)
+            if not os.path.exists(path) or os.path.getsize(path) != size:
+                return False
+        return bool(artifacts)
+
+    # ---------------------------------------------------------
+    # 상품 단위 기록
+    # ---------------------------------------------------------
+    def begin(self, product_code, product_output_dir, image_paths, master, settings, skip_unchanged=True):
+        """
+        상품 처리 시작 전에 호출합니다. 변경이 없어 건너뛸 수 있으면 True 를 반환합니다.
+        그렇지 않으면 상품을 'started' 로 기록하고 False 를 반환합니다.
+        """
+        inputs = self._hash_inputs(product_code, image_paths)
+        with self._lock:
+            entry = self.products.get(product_code)
+            if entry is None:
+                reason = "new"
+            elif entry.get("status") != "done":
+                reason = "resumed"
+            elif (entry.get("master") != master or entry.get("settings") != settings
+                  or not self._same_inputs(entry.get("inputs", {}), inputs)
+                  or "findings" not in entry
+                  or not self._artifacts_present(product_output_dir, entry.get("artifacts", []))):
+                reason = "changed"
+            elif skip_unchanged:
+                self.counts["unchanged"] += 1
+                return True
+            else:
+                reason = "forced"
+
+            self.counts[reason] += 1
+            self.products[product_code] = {"status": "started", "inputs": inputs, "master": master,
+                                           "settings": settings, "artifacts": [],
+                                           "updated": datetime.now().isoformat(timespec='seconds')}
+            self._save()
+        if reason == "resumed":
+            self.logger.info(f"[매니페스트] 이전 실행에서 중단된 상품 재개: {product_code}")
+        return False
+
+    def complete(self, product_code, product_output_dir, findings=()):
+        """상품 처리 완료 후 결과 파일 목록, 적발 행(FindingsReport.make_rows)과 함께 'done' 으로 기록합니다."""
+        artifacts = []
+        for folder, _, files in os.walk(product_output_dir):
+            for name in sorted(files):
+                # 실행마다 덧붙여지는 로그와 임시 파일은 결과물에서 제외
+                if name.endswith("_process.log") or name.startswith("temp_"):
+                    continue
+                path = os.path.join(folder, name)
+                artifacts.append([os.path.relpath(path, product_output_dir), os.path.getsize(path)])
+        with self._lock:
+            entry = self.products.get(product_code)
+            if entry is None: return
+            entry.update({"status": "done", "artifacts": artifacts, "findings": [list(row) for row in findings],
+                          "updated": datetime.now().isoformat(timespec='seconds')})
+            self._save()
+
+    def findings(self, product_code):
+        """마지막 완료 시점의 적발 행 목록"""
+        with self._lock:
+            return list(self.products.get(product_code, {}).get("findings", []))
+
+    def _save(self):
+        # 호출자가 self._lock 을 잡고 있어야 합니다. (중간에 프로세스가 죽어도 파일이 깨지지 않도록 교체 저장)
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"version": self.VERSION, "products": self.products}, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            self.logger.warning(f"[매니페스트] 저장 실패: {e}")
+
+    def log_summary(self, logger=None):
+        log = logger if logger else self.logger
+        c = self.counts
+        recomputed = c['new'] + c['changed'] + c['resumed'] + c['forced']
+        log.info(f"[매니페스트] 변경 없음(건너뜀): {c['unchanged']}건, 재처리: {recomputed}건 "
+                 f"(신규 {c['new']}, 변경 {c['changed']}, 중단 재개 {c['resumed']}, 재사용 안 함 {c['forced']})")
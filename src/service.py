@@ -0,0 +1,234 @@
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+import itertools
+from collections import OrderedDict
+from concurrent.futures import Future
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import executor
+from postprocessing import PostProcessor
+
+
+class WarmModules:
+    """
+    [Service] 호출 간에 재사용하는 무거운 모듈 묶음입니다.
+    - OCR 스택(백엔드 클라이언트/채널, OCR 캐시, 흐름 제어, 비동기 엔진): OCR 관련 인자가 같으면 그대로 재사용
+    - PostProcessor(마스터 파싱 + 매처 컴파일): 마스터 경로별로 보관하며, 파일 크기/수정시각이 바뀐 경우에만 다시 로드
+    모듈의 지표 수집기는 호출마다 새 RunMetrics 로 교체하고, 캐시/흐름 제어 집계는 0 으로 되돌려
+    각 작업의 로그에 그 작업의 수치만 남도록 합니다. (작업은 한 번에 하나씩 실행되므로 안전)
+    """
+
+    def __init__(self, max_masters=4):
+        self.max_masters = max_masters
+        self._ocr_key = None
+        self._ocr_stack = None
+        self._masters = OrderedDict()  # master_paths 키 -> (파일 상태, PostProcessor)
+
+    @staticmethod
+    def _stat_signature(master_paths):
+        signature = []
+        for key in ('ban', 'ftc', 'except'):
+            path = master_paths.get(key)
+            if path and os.path.exists(path):
+                st = os.stat(path)
+                signature.append((key, path, st.st_size, st.st_mtime_ns))
+            else:
+                signature.append((key, path, None, None))
+        return tuple(signature)
+
+    def ocr_stack(self, args, api_key_path, input_root, output_root, log_base_path, logger, metrics):
+        key = (api_key_path, log_base_path) + tuple((k, str(args.get(k, ''))) for k in executor.OCR_STACK_ARGS)
+        # 리플레이 색인은 입력/출력 폴더에 따라 달라집니다.
+        if str(args.get('strOcrBackend', 'vision')).lower() == 'replay':
+            key += (input_root, output_root)
+        if self._ocr_stack is None or key != self._ocr_key:
+            if self._ocr_stack is not None:
+                logger.info("[서비스] OCR 설정 변경 -> OCR 모듈 재생성")
+                executor.close_ocr_stack(self._ocr_stack)
+            self._ocr_stack = executor.build_ocr_stack(args, api_key_path, input_root, output_root, log_base_path, logger, metrics)
+            self._ocr_key = key
+        else:
+            logger.info("[서비스] OCR 모듈 재사용 (클라이언트/캐시 유지)")
+            self._ocr_stack['cache'].reset_stats()
+            self._ocr_stack['flow'].reset_stats()
+        self._ocr_stack['doc_proc'].metrics = metrics
+        self._ocr_stack['flow'].metrics = metrics
+        return self._ocr_stack
+
+    def post_processor(self, master_paths, log_base_path, logger, metrics, line_cache_size=50000):
+        key = (tuple(sorted(master_paths.items())), log_base_path)
+        signature = self._stat_signature(master_paths)
+        cached = self._masters.get(key)
+        if cached and cached[0] == signature:
+            self._masters.move_to_end(key)
+            logger.info("[서비스] 마스터 사전 재사용 (파일 변경 없음)")
+            post_proc = cached[1]
+            post_proc.line_cache.reset_stats()
+            if post_proc.line_cache.max_entries != max(0, int(line_cache_size)):
+                logger.info(f"[서비스] 줄 매칭 캐시 크기 변경: {post_proc.line_cache.max_entries} -> {line_cache_size}줄")
+                post_proc.line_cache.resize(line_cache_size)
+        else:
+            if cached:
+                logger.info("[서비스] 마스터 파일 변경 감지 -> 재로드")
+            post_proc = PostProcessor(master_paths, logger, cache_dir=os.path.join(log_base_path, "_cache"), metrics=metrics,
+                                      line_cache_size=line_cache_size)
+            self._masters[key] = (signature, post_proc)
+            while len(self._masters) > self.max_masters:
+                self._masters.popitem(last=False)
+        post_proc.metrics = metrics
+        return post_proc
+
+    def close(self):
+        if self._ocr_stack is not None:
+            executor.close_ocr_stack(self._ocr_stack)
+            self._ocr_stack = None
+
+
+class InspectionService:
+    """
+    [Service] run_rpa_process 를 상주 프로세스로 제공하는 로컬 HTTP 서비스입니다.
+    - POST /run   : 본문 = run_rpa_process 와 같은 인자 (JSON dict 또는 '{key,value},...' 문자열). 완료 후 같은 JSON 결과 반환
+    - POST /jobs  : 같은 인자로 작업만 등록하고 {"job_id": ...} 반환 -> GET /jobs/<id> 로 결과 조회
+    - GET /health : 상태, 대기 작업 수
+    작업은 큐에 쌓여 전용 워커 스레드 1개가 순서대로 실행합니다. (상품 단위 병렬 처리는 기존과 동일)
+    """
+
+    def __init__(self, host="127.0.0.1", port=8700, max_jobs=1000):
+        self.warm = WarmModules()
+        self.jobs = queue.Queue()
+        self.results = OrderedDict()  # job_id -> Future
+        self.max_jobs = max_jobs
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._worker = threading.Thread(target=self._work, name="Service_Worker", daemon=True)
+
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                service._handle_post(self)
+
+            def do_GET(self):
+                service._handle_get(self)
+
+            def log_message(self, fmt, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+
+    # ---------------------------------------------------------
+    # 작업 큐
+    # ---------------------------------------------------------
+    def submit(self, args):
+        future = Future()
+        with self._lock:
+            job_id = str(next(self._ids))
+            self.results[job_id] = future
+            # 오래된 결과부터 정리
+            while len(self.results) > self.max_jobs:
+                self.results.popitem(last=False)
+        self.jobs.put((job_id, args, future))
+        return job_id, future
+
+    def _work(self):
+        while True:
+            job = self.jobs.get()
+            if job is None: break
+            job_id, args, future = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(executor.run_rpa_process(args, warm=self.warm))
+            except Exception as e:
+                future.set_result(json.dumps({"status": "FAIL", "error": str(e)}, ensure_ascii=False))
+
+    # ---------------------------------------------------------
+    # HTTP
+    # ---------------------------------------------------------
+    @staticmethod
+    def _parse_args(body):
+        text = body.decode('utf-8').strip()
+        if text.startswith("{") and not text.startswith('{"'):
+            return text  # '{key,value},...' 형식은 run_rpa_process 가 직접 해석
+        try:
+            return json.loads(text)
+        except ValueError:
+            return text
+
+    def _send(self, handler, status, body):
+        data = body.encode('utf-8') if isinstance(body, str) else json.dumps(body, ensure_ascii=False).encode('utf-8')
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json; charset=utf-8")
+        handler.send_header("Content-Length", str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def _handle_post(self, handler):
+        length = int(handler.headers.get("Content-Length", 0))
+        args = self._parse_args(handler.rfile.read(length))
+        path = handler.path.split('?')[0]
+        if path == "/run":
+            _, future = self.submit(args)
+            return self._send(handler, 200, future.result())
+        if path == "/jobs":
+            job_id, _ = self.submit(args)
+            return self._send(handler, 202, {"job_id": job_id})
+        self._send(handler, 404, {"status": "FAIL", "error": "not found"})
+
+    def _handle_get(self, handler):
+        path = handler.path.split('?')[0]
+        if path == "/health":
+            return self._send(handler, 200, {"status": "OK", "queued": self.jobs.qsize()})
+        if path.startswith("/jobs/"):
+            with self._lock:
+                future = self.results.get(path[len("/jobs/"):])
+            if future is None:
+                return self._send(handler, 404, {"status": "FAIL", "error": "unknown job"})
+            if not future.done():
+                return self._send(handler, 200, {"status": "RUNNING" if future.running() else "QUEUED"})
+            return self._send(handler, 200, future.result())
+        self._send(handler, 404, {"status": "FAIL", "error": "not found"})
+
+    @property
+    def endpoint(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._worker.start()
+        threading.Thread(target=self._httpd.serve_forever, name="Service_HTTP", daemon=True).start()
+        print(f"[서비스] 검사 서비스 시작: {self.endpoint}")
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self.jobs.put(None)
+        self._worker.join(timeout=30)
+        self.warm.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="NS-Google_Vision 상주 검사 서비스")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8700)
+    args = parser.parse_args(argv)
+
+    service = InspectionService(args.host, args.port).start()
+    try:
+        while True: time.sleep(3600)
+    except KeyboardInterrupt:
+        service.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+import unicodedata
+import numpy as np
+
+
+class WordTable:
+    """
+    [Step 3: Post-processing] 이미지 1장의 OCR 단어 목록을 열(column) 단위 배열로 보관하는 테이블입니다.
+    - text_annotations 를 한 번만 순회하여 x0/y0/x1/y1, 단어 문자열, 정규화(NFC) 길이를 만듭니다.
+    - 줄 묶기/줄 영역/매칭 영역 계산은 protobuf 꼭짓점 대신 이 배열 위에서 수행합니다.
+    """
+    __slots__ = ('x0', 'y0', 'x1', 'y1', 'descriptions', 'norm_lens')
+
+    def __init__(self, x0, y0, x1, y1, descriptions, norm_lens):
+        self.x0 = x0
+        self.y0 = y0
+        self.x1 = x1
+        self.y1 = y1
+        self.descriptions = descriptions
+        self.norm_lens = norm_lens
+
+    def __len__(self):
+        return len(self.descriptions)
+
+    @classmethod
+    def from_annotations(cls, annotations):
+        """text_annotations[1:] (단어 단위 EntityAnnotation 목록)로부터 테이블을 만듭니다."""
+        n = len(annotations)
+        coords = np.zeros((n, 4), dtype=np.int64)
+        descriptions = []
+        norm_lens = np.zeros(n, dtype=np.int64)
+        for i, ann in enumerate(annotations):
+            vertices = ann.bounding_poly.vertices
+            if vertices:
+                xs = [v.x for v in vertices]
+                ys = [v.y for v in vertices]
+                coords[i] = (min(xs), min(ys), max(xs), max(ys))
+            descriptions.append(ann.description)
+            norm_lens[i] = len(unicodedata.normalize('NFC', ann.description))
+        return cls(coords[:, 0], coords[:, 1], coords[:, 2], coords[:, 3], descriptions, norm_lens)
+
+    @classmethod
+    def from_columns(cls, descriptions, boxes):
+        """단어 문자열 목록과 [x0, y0, x1, y1] 목록(사이드카/캐시 복원용)으로 테이블을 만듭니다."""
+        coords = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+        descriptions = list(descriptions)
+        norm_lens = np.fromiter((len(unicodedata.normalize('NFC', d)) for d in descriptions), dtype=np.int64, count=len(descriptions))
+        return cls(coords[:, 0], coords[:, 1], coords[:, 2], coords[:, 3], descriptions, norm_lens)
+
+    def group_lines(self, y_tolerance=15):
+        """
+        단어들을 y 중심 기준으로 줄 단위로 묶고, 각 줄의 단어 인덱스 배열(x 순 정렬)을 반환합니다.
+        (기존 _group_into_lines 와 동일한 규칙: min y 순 안정 정렬 -> 줄 첫 단어의 중심 y 와 비교)
+        """
+        if len(self) == 0:
+            return []
+        order = np.argsort(self.y0, kind='stable')
+        centers = ((self.y0 + self.y1) / 2.0)[order]
+
+        # 줄 시작 위치 찾기: 줄 기준 y(last_y)가 새 줄마다 갱신되므로 순차 비교가 필요하지만 float 배열만 다룹니다.
+        starts = [0]
+        last_y = centers[0]
+        for i, c in enumerate(centers.tolist()):
+            if abs(c - last_y) > y_tolerance:
+                starts.append(i)
+                last_y = c
+        bounds = starts + [len(order)]
+
+        lines = []
+        for s, e in zip(bounds[:-1], bounds[1:]):
+            idx = order[s:e]
+            idx = idx[np.argsort(self.x0[idx], kind='stable')]
+            lines.append(idx)
+        return lines
+
+    def bbox(self, idx):
+        """단어 인덱스 배열이 덮는 영역 [min_x, min_y, max_x, max_y]"""
+        return [int(self.x0[idx].min()), int(self.y0[idx].min()), int(self.x1[idx].max()), int(self.y1[idx].max())]